@@ -1,16 +1,59 @@
+import os
+
+# Largest upload accepted, in pixels. OpenCV enforces it too, which is the only
+# check before decoding formats whose header image_ingest cannot read (BMP, WebP,
+# TIFF, ...); it reads OPENCV_IO_MAX_IMAGE_PIXELS once, so set it before cv2 loads.
+MAX_IMAGE_PIXELS = 50 * 1000 * 1000
+os.environ.setdefault("OPENCV_IO_MAX_IMAGE_PIXELS", str(MAX_IMAGE_PIXELS))
+
 from flask_cors import CORS
-from flask import Flask, request, jsonify
-from tensorflow.keras.models import load_model
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context, send_file
 import numpy as np
 import cv2
-import os
+import atexit
+import base64
+import io
+import json
+import hashlib
+import math
+import queue
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import wraps
 import sqlite3
-from datetime import datetime, timedelta
-
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, timedelta, timezone
+
+from batching import MicroBatcher
+from db import Database
+from write_buffer import WriteBehindBuffer
+from snapshot_cache import SnapshotCache
+from role_cache import RoleCache
+from upload_store import UploadStore
+import image_ingest
+from password_hasher import PasswordHasher
+from instrumentation import stage, add_stage_observer
+from metrics import Registry
+from migrations import migrate
+import queries
+import rollups
+from profiler import RequestProfiler
+from model_backends import MODEL_INPUT_SHAPES, load_backend
+from result_cache import ResultCache, make_key
 from flask_jwt_extended import (
-    JWTManager, create_access_token, jwt_required, get_jwt_identity
+    JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity, decode_token
 )
+from streaming import FaceTracker, LatestFrame
+from job_queue import JobQueue
+from shared_state import SharedState
+
+# WebSocket support for /predict/stream is optional (pip install flask-sock)
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -36,13 +79,94 @@ def missing_token_callback(error):
     print(f"JWT ERROR: Missing token - {str(error)}")
     return jsonify({"error": "Authorization token is missing", "msg": str(error)}), 401
 
+# ====== Metrics (served at /metrics) & profiling ======
+# Every sample carries the worker's pid: under serve.py each scrape reaches one worker
+metrics_registry = Registry(const_labels=lambda: {"pid": os.getpid()})
+
+REQUESTS_TOTAL = metrics_registry.counter(
+    "masklens_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+REQUEST_SECONDS = metrics_registry.histogram(
+    "masklens_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+STAGE_SECONDS = metrics_registry.histogram(
+    "masklens_stage_duration_seconds", "Time spent in each prediction pipeline stage", ("stage",))
+FACES_DETECTED = metrics_registry.histogram(
+    "masklens_faces_detected", "Faces detected per image", buckets=(0, 1, 2, 3, 5, 10, 20))
+PREDICTIONS_TOTAL = metrics_registry.counter(
+    "masklens_predictions_total", "Pipeline runs by outcome (ok, no_face, error)", ("outcome",))
+DB_QUERY_SECONDS = metrics_registry.histogram(
+    "masklens_db_query_duration_seconds", "SQLite statement execution time by endpoint", ("endpoint",))
+WRITE_FLUSH_ROWS = metrics_registry.histogram(
+    "masklens_write_buffer_flush_rows", "Rows committed per write-behind flush",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+WRITE_FLUSH_SECONDS = metrics_registry.histogram(
+    "masklens_write_buffer_flush_seconds", "Time to commit one write-behind flush")
+
+add_stage_observer(lambda name, seconds: STAGE_SECONDS.observe(seconds, stage=name))
+
+@app.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+    if profiler.enabled:
+        g.profile_session = profiler.start(request.path)
+
+@app.after_request
+def _record_request_metrics(response):
+    start = g.pop("request_start", None)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+        REQUESTS_TOTAL.inc(route=route, method=request.method, status=response.status_code)
+
+    session = g.pop("profile_session", None)
+    if session is not None:
+        profiler.finish(session, {
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "content_length": request.content_length,
+            "pid": os.getpid()
+        })
+    return response
+
 # ====== Paths & DB ======
-# Use absolute paths to avoid duplicate files
+# Use absolute paths to avoid duplicate files. MASKLENS_DB_PATH / MASKLENS_UPLOAD_FOLDER /
+# MASKLENS_JOBS_DB_PATH move them elsewhere (tests point them at a temporary directory)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "database.db")
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
+DB_PATH = os.environ.get("MASKLENS_DB_PATH", os.path.join(BASE_DIR, "database.db"))
+UPLOAD_FOLDER = os.environ.get("MASKLENS_UPLOAD_FOLDER", os.path.join(BASE_DIR, "uploads"))
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Admin-controlled request profiler (see /admin/profiler); idle unless enabled
+PROFILES_DIR = os.path.join(BASE_DIR, "profiles")
+profiler = RequestProfiler(PROFILES_DIR)
+
+# Uploads are decoded in memory; set True to also keep the raw files in UPLOAD_FOLDER.
+# Either way emotions.filename records the image's content key (see upload_store.py)
+SAVE_RAW_UPLOADS = False
+SAVE_ANNOTATED_UPLOADS = False
+UPLOAD_RETENTION_DAYS = 30                 # Stored images older than this are removed...
+UPLOAD_MAX_TOTAL_MB = 2048                 # ...and the oldest beyond this total (None: no limit)
+UPLOAD_GC_INTERVAL_SECONDS = 600
+upload_store = UploadStore(
+    UPLOAD_FOLDER,
+    max_age_seconds=UPLOAD_RETENTION_DAYS * 86400 if UPLOAD_RETENTION_DAYS else None,
+    max_total_bytes=UPLOAD_MAX_TOTAL_MB * 1024 * 1024 if UPLOAD_MAX_TOTAL_MB else None,
+    gc_interval_seconds=UPLOAD_GC_INTERVAL_SECONDS
+)
+
+# Ingest limits (see image_ingest.py). Uploads are decoded at the smallest IMREAD_REDUCED_*
+# scale that keeps INGEST_MIN_SIDE pixels on the short side (None: full resolution)
+INGEST_MIN_SIDE = 720
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+# MAX_IMAGE_PIXELS is set at the top of the file, before OpenCV loads
+MAX_REQUEST_BYTES = 64 * 1024 * 1024   # Whole request body, batch uploads and zips included
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Request larger than {MAX_REQUEST_BYTES} bytes"}), 413
+
 print(f"Database path: {DB_PATH}")
 print(f"Upload folder: {UPLOAD_FOLDER}")
 
@@ -50,8 +174,85 @@ print(f"Upload folder: {UPLOAD_FOLDER}")
 # Based on tested code: mask_pred < 0.5 = MASK, mask_pred >= 0.5 = NO MASK
 INVERT_MASK_PREDICTION = True  # Model outputs high value for NO MASK, low value for MASK
 
-# Store mask inversion state in a global variable (can be toggled via API)
-mask_inversion_state = {"inverted": INVERT_MASK_PREDICTION}
+# Store mask inversion state in shared memory (can be toggled via API and is
+# seen by every worker of the prefork server, see serve.py)
+mask_inversion_state = SharedState(inverted=INVERT_MASK_PREDICTION)
+
+# Inference runtime for the mask/emotion models: "keras", "tf_function", "tflite" or "onnx"
+# (tflite/onnx files are produced by convert_models.py)
+INFERENCE_BACKEND = "keras"
+MODEL_DIR = BASE_DIR
+# Precision: "float32", or "float16" / "int8" (tflite backend, files from quantize_models.py)
+MODEL_VARIANT = "float32"
+
+# Run dummy batches through every model once loaded (serve.py sets MASKLENS_WARMUP=0
+# and warms each worker after fork instead)
+WARMUP_MODELS = os.environ.get("MASKLENS_WARMUP", "1") == "1"
+# Load the models at import (serve.py sets MASKLENS_LOAD_MODELS=0 and decides where to load them)
+LOAD_MODELS_ON_IMPORT = os.environ.get("MASKLENS_LOAD_MODELS", "1") == "1"
+
+# Prediction result cache (identical frames skip detection and inference)
+ENABLE_RESULT_CACHE = True
+RESULT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = 600
+RESULT_CACHE_DISK_PATH = None  # e.g. os.path.join(BASE_DIR, "result_cache.db") to survive restarts
+
+# Live stream: face_net runs every N frames (or when tracking is lost), a tracker in between
+STREAM_DETECT_EVERY = 10
+STREAM_TRACK_MIN_CONFIDENCE = 0.6
+
+# /predict/batch: images decoded and detected in parallel, results streamed as NDJSON
+BATCH_ENDPOINT_WORKERS = 4
+BATCH_ENDPOINT_MAX_IMAGES = 500
+BATCH_MAX_INFLATED_BYTES = 256 * 1024 * 1024  # All images of one batch once unzipped
+
+# /predict/async job queue (workers: python job_worker.py --workers N)
+JOBS_DB_PATH = os.environ.get("MASKLENS_JOBS_DB_PATH", os.path.join(BASE_DIR, "jobs.db"))
+JOB_MAX_ATTEMPTS = 3
+JOB_STALE_SECONDS = 300  # 'running' jobs older than this are assumed abandoned and retried
+
+# Micro-batching: face crops from concurrent requests are grouped into one model call
+ENABLE_MICRO_BATCHING = True
+BATCH_MAX_SIZE = 16      # Maximum samples per model call
+BATCH_MAX_WAIT_MS = 5    # How long the first sample waits for others to join
+
+# SQLite connection pool (see db.py); connections run in WAL mode
+DB_POOL_SIZE = 8
+DB_BUSY_TIMEOUT_MS = 5000
+DB_SYNCHRONOUS = "NORMAL"   # "FULL" to fsync every commit
+DB_CACHE_SIZE_KB = 16384    # Page cache per connection
+
+# Write-behind buffer for emotion inserts: rows are group-committed by a background
+# thread every WRITE_BUFFER_FLUSH_MS or WRITE_BUFFER_MAX_ROWS rows instead of one
+# commit per prediction. Rows still queued are flushed at exit but lost on a crash,
+# so leave it off when every record must be durable (DB_SYNCHRONOUS sets how
+# durable each commit is).
+ENABLE_WRITE_BUFFER = False
+WRITE_BUFFER_MAX_ROWS = 200
+WRITE_BUFFER_FLUSH_MS = 20
+WRITE_BUFFER_MAX_QUEUE = 10000      # Callers block once this many rows are waiting...
+WRITE_BUFFER_PUT_TIMEOUT = 1.0      # ...and write the rows themselves after this many seconds
+
+# Admin GET responses (dashboard, stats, users, emotions) are cached per data version and
+# served with ETag / Last-Modified so unchanged polls get a 304 (see snapshot_response)
+ENABLE_ADMIN_SNAPSHOTS = True
+ADMIN_SNAPSHOT_MAX_ENTRIES = 256
+
+# Keyset pagination for /my_emotions and /admin/emotions (?limit=&cursor=&direction=)
+EMOTIONS_PAGE_SIZE = 50
+ADMIN_EMOTIONS_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Admin routes trust the role claim in the access token, confirmed against a per-process
+# cache of users.role; a deleted or demoted admin loses access within this many seconds
+ROLE_CACHE_TTL_SECONDS = 60
+
+# Password hashing runs on its own small pool so login bursts cannot take every core
+# from inference; requests that wait longer than PASSWORD_HASH_WAIT_SECONDS get a 503
+PASSWORD_HASH_ITERATIONS = 600000   # PBKDF2-SHA256 work factor for new hashes
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 64
+PASSWORD_HASH_WAIT_SECONDS = 10.0
 
 # ====== Password Validation ======
 import re
@@ -86,138 +287,366 @@ def validate_password(password):
     
     return True, "Password is valid"
 
-# ====== Initialize DB (users + emotions) ======
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # Users table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fullname TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            created_at TEXT
-        )
-    """)
+# ====== Database connections ======
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor that records statement time in DB_QUERY_SECONDS"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._observe(start)
+
+    @staticmethod
+    def _observe(start):
+        endpoint = (request.endpoint or "unmatched") if has_request_context() else "background"
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+class _TimedConnection(sqlite3.Connection):
+    # Connection.execute() builds its cursor in C without calling cursor(), so the
+    # shortcuts are routed through a _TimedCursor explicitly to be timed as well
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def open_database(path):
+    """(Re)point the app at a database file; benchmark_pipeline.py uses a scratch DB"""
+    global DB_PATH, db
+    old = globals().get("db")
+    if old is not None:
+        old.close_all()
+    DB_PATH = path
+    db = Database(
+        DB_PATH,
+        pool_size=DB_POOL_SIZE,
+        busy_timeout_ms=DB_BUSY_TIMEOUT_MS,
+        synchronous=DB_SYNCHRONOUS,
+        cache_size_kb=DB_CACHE_SIZE_KB,
+        factory=_TimedConnection,
+    )
+    return db
 
-    # Check if role column exists, if not add it
-    cur.execute("PRAGMA table_info(users)")
-    columns = [column[1] for column in cur.fetchall()]
-    
-    if 'role' not in columns:
-        print("Adding role column to users table...")
-        cur.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
-        print("Role column added successfully!")
+open_database(DB_PATH)
 
-    # Create default admin (only if not exists)
-    cur.execute("SELECT * FROM users WHERE email = 'admin@gmail.com'")
-    admin_exists = cur.fetchone()
+def get_db_conn():
+    """Borrow a pooled connection: `with get_db_conn() as conn:`"""
+    return db.connection()
 
-    if not admin_exists:
-        admin_pass = generate_password_hash("admin123")
-        cur.execute(
-            "INSERT INTO users (fullname, email, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?)",
-            ("Admin", "admin@gmail.com", admin_pass, "admin", datetime.now().isoformat())
-        )
-        print("Default admin user created!")
-
-    # Emotions table (linked to user)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS emotions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            filename TEXT,
-            emotion TEXT,
-            timestamp TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
+def bump_data_version(cur):
+    """Mark cached admin snapshots stale; call inside the transaction that changes users/emotions"""
+    cur.execute("UPDATE data_version SET version = version + 1, updated_at = ? WHERE id = 1", (time.time(),))
+
+# ====== Timestamps ======
+def now_timestamps():
+    """Current time as (local ISO string returned by the API, UTC epoch seconds used in queries)"""
+    now = time.time()
+    return datetime.fromtimestamp(now).isoformat(), int(now)
+
+def since_day(days):
+    """Local calendar date `days` ago ('YYYY-MM-DD'), for `day >= ?` filters on rollups"""
+    return (datetime.now() - timedelta(days=days)).date().isoformat()
 
-    conn.commit()
-    conn.close()
+def since_month_start(months_back):
+    """Epoch seconds at local midnight on the 1st of the month `months_back` months ago"""
+    today = datetime.now()
+    year, month = divmod(today.year * 12 + today.month - 1 - months_back, 12)
+    return int(datetime(year, month + 1, 1).timestamp())
+
+# ====== Initialize DB (users + emotions) ======
+password_hasher = PasswordHasher(PASSWORD_HASH_ITERATIONS, PASSWORD_HASH_WORKERS,
+                                 PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_WAIT_SECONDS)
+
+def init_db():
+    # Schema changes live in migrations.py
+    with get_db_conn() as conn:
+        migrate(conn)
+
+    # Create default admin (only if not exists)
+    with db.transaction() as cur:
+        cur.execute("SELECT id FROM users WHERE email = 'admin@gmail.com'")
+        admin_exists = cur.fetchone()
+
+        if not admin_exists:
+            admin_pass = password_hasher.hash("admin123")
+            created_at, created_ts = now_timestamps()
+            cur.execute(
+                "INSERT INTO users (fullname, email, password_hash, role, created_at, created_ts) VALUES (?, ?, ?, ?, ?, ?)",
+                ("Admin", "admin@gmail.com", admin_pass, "admin", created_at, created_ts)
+            )
+            bump_data_version(cur)
+            print("Default admin user created!")
 
 init_db()
 
+job_queue = JobQueue(JOBS_DB_PATH, JOB_MAX_ATTEMPTS, JOB_STALE_SECONDS)
+
 # ====== Helper DB functions ======
-def get_db_conn():
-    return sqlite3.connect(DB_PATH)
+def insert_emotions(records):
+    """Insert (user_id, filename, emotion, timestamp, ts) records and their rollup counts in one transaction"""
+    with db.transaction() as cur:
+        cur.executemany(
+            "INSERT INTO emotions (user_id, filename, emotion, timestamp, ts) VALUES (?, ?, ?, ?, ?)",
+            records
+        )
+        rollups.record(cur, [(user_id, timestamp, emotion) for user_id, _, emotion, timestamp, _ in records])
+        bump_data_version(cur)
+
+def _observe_flush(rows, seconds):
+    WRITE_FLUSH_ROWS.observe(rows)
+    WRITE_FLUSH_SECONDS.observe(seconds)
+
+emotion_writer = WriteBehindBuffer(
+    insert_emotions,
+    "emotions",
+    max_rows=WRITE_BUFFER_MAX_ROWS,
+    flush_interval_ms=WRITE_BUFFER_FLUSH_MS,
+    max_queue=WRITE_BUFFER_MAX_QUEUE,
+    put_timeout=WRITE_BUFFER_PUT_TIMEOUT,
+    on_flush=_observe_flush,
+)
+atexit.register(emotion_writer.close)
+
+def flush_pending_writes():
+    """Commit emotions still queued in the write-behind buffer (serve.py calls this on worker exit)"""
+    emotion_writer.close()
 
 def save_emotion(user_id, filename, emotion):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO emotions (user_id, filename, emotion, timestamp) VALUES (?, ?, ?, ?)",
-        (user_id, filename, emotion, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    save_emotions([(user_id, filename, emotion)])
+
+def save_emotions(rows):
+    """Insert many (user_id, filename, emotion) rows in a single transaction (or queue them, see ENABLE_WRITE_BUFFER)"""
+    if not rows:
+        return
+    timestamp, ts = now_timestamps()
+    records = [(user_id, filename, emotion, timestamp, ts) for user_id, filename, emotion in rows]
+    with stage("db_write"):
+        if ENABLE_WRITE_BUFFER:
+            emotion_writer.submit(records)
+        else:
+            insert_emotions(records)
 
 def create_user(fullname, email, password):
-    pwd_hash = generate_password_hash(password)
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO users (fullname, email, password_hash, created_at) VALUES (?, ?, ?, ?)",
-        (fullname, email, pwd_hash, datetime.now().isoformat())
-    )
-    conn.commit()
-    user_id = cur.lastrowid
-    conn.close()
-    return user_id
+    pwd_hash = password_hasher.hash(password)
+    created_at, created_ts = now_timestamps()
+    with db.transaction() as cur:
+        cur.execute(
+            "INSERT INTO users (fullname, email, password_hash, created_at, created_ts) VALUES (?, ?, ?, ?, ?)",
+            (fullname, email, pwd_hash, created_at, created_ts)
+        )
+        bump_data_version(cur)
+        return cur.lastrowid
 
 def find_user_by_email(email):
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE email = ?", (email,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    """id, password_hash, role and fullname of the user with this email, or None"""
+    with get_db_conn() as conn:
+        return conn.execute(queries.FIND_USER_BY_EMAIL, (email,)).fetchone()
 
 # ====== Existing prediction code (unchanged behavior) ======
-try:
-    print("Loading mask + emotion models...")
-    mask_model = load_model("mask_detection_model.h5")
-    emotion_regular = load_model("emotion_model_regular.h5")
-    emotion_masked = load_model("emotion_model_masked.h5")
-
-    regular_labels = ["Happy", "Sad"]
-    masked_labels  = ["Happy", "Sad"]
-
-    # Load OpenCV DNN face detector
-    print("Loading OpenCV DNN face detector...")
-    DNN_MODEL_PATH = os.path.join(BASE_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
-    DNN_CONFIG_PATH = os.path.join(BASE_DIR, "deploy.prototxt")
-    face_net = cv2.dnn.readNetFromCaffe(DNN_CONFIG_PATH, DNN_MODEL_PATH)
-
+DNN_MODEL_PATH = os.path.join(BASE_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+DNN_CONFIG_PATH = os.path.join(BASE_DIR, "deploy.prototxt")
+
+regular_labels = ["Happy", "Sad"]
+masked_labels  = ["Happy", "Sad"]
+
+# Filled in by load_models() (in a background thread, see start_model_loading)
+mask_model = None
+emotion_regular = None
+emotion_masked = None
+face_net = None
+MODEL_VERSION = ""
+batchers = {}
+
+model_status = {
+    "ready": False,
+    "loading": False,
+    "error": None,
+    "backend": INFERENCE_BACKEND,
+    "variant": MODEL_VARIANT,
+    "load_seconds": {},
+    "warmup_seconds": {},
+}
+_models_ready = threading.Event()
+
+# cv2.dnn.Net is not thread-safe: request threads borrow a detector from this
+# pool, which grows to the peak number of concurrent detections
+_face_net_pool = queue.LifoQueue()
+
+def _load_face_net():
+    return cv2.dnn.readNetFromCaffe(DNN_CONFIG_PATH, DNN_MODEL_PATH)
+
+@contextmanager
+def borrow_face_net():
+    try:
+        net = _face_net_pool.get_nowait()
+    except queue.Empty:
+        net = _load_face_net()
+    try:
+        yield net
+    finally:
+        _face_net_pool.put(net)
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, round(time.perf_counter() - start, 3)
+
+def _model_version(*models):
+    """Identifies the loaded model files so cached results are dropped when they change"""
+    parts = []
+    for model in models:
+        if model is not None:
+            parts.append(f"{model.path}:{os.path.getmtime(model.path)}")
+    return f"{INFERENCE_BACKEND}|" + "|".join(parts)
+
+def load_models():
+    """Loads the three models and the face detector in parallel threads"""
+    global mask_model, emotion_regular, emotion_masked, face_net, MODEL_VERSION, batchers
+
+    print(f"Loading mask + emotion models ({INFERENCE_BACKEND} backend, {MODEL_VARIANT}) and DNN face detector...")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = {
+            name: pool.submit(_timed, load_backend, INFERENCE_BACKEND, name, MODEL_DIR, MODEL_VARIANT)
+            for name in MODEL_INPUT_SHAPES
+        }
+        futures["face_net"] = pool.submit(_timed, _load_face_net)
+
+        loaded = {}
+        for name, future in futures.items():
+            loaded[name], model_status["load_seconds"][name] = future.result()
+            print(f"  Loaded {name} in {model_status['load_seconds'][name]}s")
+
+    mask_model = loaded["mask"]
+    emotion_regular = loaded["emotion_regular"]
+    emotion_masked = loaded["emotion_masked"]
+    face_net = loaded["face_net"]
+    _face_net_pool.put(face_net)
+
+    MODEL_VERSION = _model_version(mask_model, emotion_regular, emotion_masked)
+    if ENABLE_MICRO_BATCHING:
+        batchers = {
+            "mask": MicroBatcher(mask_model.predict, "mask",
+                                 BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS),
+            "emotion_regular": MicroBatcher(emotion_regular.predict, "emotion_regular",
+                                            BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS),
+            "emotion_masked": MicroBatcher(emotion_masked.predict, "emotion_masked",
+                                           BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS),
+        }
     print("Models and DNN face detector loaded successfully!")
-    
-except Exception as e:
-    print(f"ERROR loading model: {e}")
-    mask_model = None
-    emotion_regular = None
-    emotion_masked = None
-    face_net = None
+
+def warmup_models():
+    """Runs dummy batches through every model and the face detector so the first request is not slow"""
+    models = {
+        "mask": mask_model,
+        "emotion_regular": emotion_regular,
+        "emotion_masked": emotion_masked,
+    }
+    for name, model in models.items():
+        start = time.perf_counter()
+        for batch_size in sorted({1, BATCH_MAX_SIZE}):
+            model.predict(np.zeros((batch_size,) + MODEL_INPUT_SHAPES[name], dtype="float32"))
+        model_status["warmup_seconds"][name] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    dummy = np.zeros((300, 300, 3), dtype=np.uint8)
+    with borrow_face_net() as net:
+        net.setInput(cv2.dnn.blobFromImage(dummy, 1.0, (300, 300), (104.0, 177.0, 123.0)))
+        net.forward()
+    model_status["warmup_seconds"]["face_net"] = round(time.perf_counter() - start, 3)
+    print(f"Warmup complete: {model_status['warmup_seconds']}")
+
+def _load_and_warmup(warmup):
+    try:
+        load_models()
+        if warmup:
+            warmup_models()
+        model_status["ready"] = True
+    except Exception as e:
+        print(f"ERROR loading model: {e}")
+        model_status["error"] = str(e)
+    finally:
+        model_status["loading"] = False
+        _models_ready.set()
+
+def start_model_loading(background=True, warmup=WARMUP_MODELS):
+    """Starts loading the models; with background=True the server can bind immediately"""
+    model_status["loading"] = True
+    if background:
+        threading.Thread(target=_load_and_warmup, args=(warmup,), name="model-loader", daemon=True).start()
+    else:
+        _load_and_warmup(warmup)
+
+def wait_for_models(timeout=None):
+    """Blocks until loading finished (successfully or not). Returns True when the models are ready."""
+    _models_ready.wait(timeout)
+    return model_status["ready"]
+
+def models_unavailable_response():
+    """Error response for inference routes while models are loading or failed, else None"""
+    if model_status["ready"]:
+        return None
+    if model_status["error"]:
+        return jsonify({"error": "Models not loaded"}), 500
+    return jsonify({"error": "Models are still loading, try again shortly"}), 503
+
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_DISK_PATH)
+
+metrics_registry.gauge(
+    "masklens_model_queue_depth", "Samples waiting in each model micro-batcher", ("model",),
+    callback=lambda: {(name,): b.stats()["queue_depth"] for name, b in batchers.items()})
+metrics_registry.gauge(
+    "masklens_job_queue_depth", "Queued /predict/async jobs",
+    callback=lambda: {(): job_queue.stats()["queue_depth"]})
+metrics_registry.gauge(
+    "masklens_write_buffer_queue_depth", "Emotion rows waiting in the write-behind buffer",
+    callback=lambda: {(): emotion_writer.stats()["queue_depth"]})
+metrics_registry.gauge(
+    "masklens_models_ready", "1 once models are loaded and warmed up",
+    callback=lambda: {(): int(model_status["ready"])})
+
+if LOAD_MODELS_ON_IMPORT:
+    start_model_loading()
+
+# ====== Model execution (optionally micro-batched) ======
+def run_model(name, batch):
+    """
+    Run a batch (N, H, W, C) through one of the models by name
+    ("mask", "emotion_regular", "emotion_masked").
+    Goes through the micro-batcher when enabled so concurrent requests share a call.
+    """
+    if name in batchers:
+        return batchers[name].predict(batch)
+    model = {
+        "mask": mask_model,
+        "emotion_regular": emotion_regular,
+        "emotion_masked": emotion_masked,
+    }[name]
+    return model.predict(batch)
 
 
 #face detection changes
-def predict_emotion_from_path(image_path):
+FACE_CONFIDENCE_THRESHOLD = 0.5
+
+def detect_faces(img_bgr):
     """
-    Uses OpenCV DNN face detector, then applies your mask_model and emotion models.
-    Returns: (result_dict, error_msg, annotated_image_path)
+    Runs the OpenCV DNN (SSD) face detector.
+    Returns a list of {"bbox", "area", "confidence"} sorted by area, largest first.
     """
-    try:
-        # Read image in BGR format (OpenCV default)
-        img_bgr = cv2.imread(image_path)
-        if img_bgr is None:
-            return None, "Image read error", None
+    h_img, w_img = img_bgr.shape[:2]
 
-        h_img, w_img = img_bgr.shape[:2]
-        print(f"Image size: {w_img}x{h_img}")
-
-        # OpenCV DNN face detection
+    with stage("blob"):
         blob = cv2.dnn.blobFromImage(
             img_bgr, 
             scalefactor=1.0, 
@@ -226,65 +655,67 @@ def predict_emotion_from_path(image_path):
             swapRB=False,
             crop=False
         )
+    
+    with stage("ssd_forward"), borrow_face_net() as net:
+        net.setInput(blob)
+        detections = net.forward()
+    
+    print(f"DNN detected {detections.shape[2]} potential faces")
+    
+    # Parse detections and filter by confidence
+    faces_list = []
+    
+    for i in range(detections.shape[2]):
+        confidence = detections[0, 0, i, 2]
         
-        face_net.setInput(blob)
-        detections = face_net.forward()
-        
-        print(f"DNN detected {detections.shape[2]} potential faces")
-        
-        # Parse detections and filter by confidence
-        faces_list = []
-        confidence_threshold = 0.5
-        
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
+        if confidence > FACE_CONFIDENCE_THRESHOLD:
+            # Get bounding box coordinates
+            x1 = int(detections[0, 0, i, 3] * w_img)
+            y1 = int(detections[0, 0, i, 4] * h_img)
+            x2 = int(detections[0, 0, i, 5] * w_img)
+            y2 = int(detections[0, 0, i, 6] * h_img)
             
-            if confidence > confidence_threshold:
-                # Get bounding box coordinates
-                x1 = int(detections[0, 0, i, 3] * w_img)
-                y1 = int(detections[0, 0, i, 4] * h_img)
-                x2 = int(detections[0, 0, i, 5] * w_img)
-                y2 = int(detections[0, 0, i, 6] * h_img)
-                
-                # Clamp to image bounds
-                x1, y1 = max(0, x1), max(0, y1)
-                x2, y2 = min(w_img - 1, x2), min(h_img - 1, y2)
-                
-                # Validate bbox
-                if x2 > x1 and y2 > y1:
-                    area = (x2 - x1) * (y2 - y1)
-                    faces_list.append({
-                        "bbox": (x1, y1, x2, y2), 
-                        "area": area, 
-                        "confidence": float(confidence)
-                    })
-                    print(f"  Face {i}: confidence={confidence:.3f}, bbox=({x1},{y1},{x2},{y2})")
-
-        if not faces_list:
-            print("❌ No faces detected with confidence > 0.5")
-            return None, "No face detected. Please ensure your face is visible and well-lit.", None
-
-        # Choose the largest face
-        faces_list = sorted(faces_list, key=lambda x: x["area"], reverse=True)
-        chosen = faces_list[0]
-        x1, y1, x2, y2 = chosen["bbox"]
-        print(f"✅ Selected face with area {chosen['area']} pixels")
-
-        # Extract face region (BGR format)
-        face_bgr = img_bgr[y1:y2, x1:x2]
-        if face_bgr.size == 0:
-            return None, "Invalid face region", None
-
-        # Convert to RGB for mask model
-        face_rgb = cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB)
+            # Clamp to image bounds
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w_img - 1, x2), min(h_img - 1, y2)
+            
+            # Validate bbox
+            if x2 > x1 and y2 > y1:
+                area = (x2 - x1) * (y2 - y1)
+                faces_list.append({
+                    "bbox": (x1, y1, x2, y2), 
+                    "area": area, 
+                    "confidence": float(confidence)
+                })
+                print(f"  Face {i}: confidence={confidence:.3f}, bbox=({x1},{y1},{x2},{y2})")
+
+    return sorted(faces_list, key=lambda x: x["area"], reverse=True)
+
+def classify_faces(img_bgr, faces):
+    """
+    Classifies every face with one mask-model batch, then splits the faces by
+    mask status into one batch per emotion model.
+    Returns one result dict per face, in the same order as `faces`.
+    """
+    with stage("crop_resize"):
+        faces_rgb = []
+        for face in faces:
+            x1, y1, x2, y2 = face["bbox"]
+            faces_rgb.append(cv2.cvtColor(img_bgr[y1:y2, x1:x2], cv2.COLOR_BGR2RGB))
 
         # --- Mask detection: RGB image, 128x128, normalized to float32 ---
-        mask_face = cv2.resize(face_rgb, (128, 128))
-        mask_face = mask_face.astype("float32") / 255.0
-        mask_face = np.expand_dims(mask_face, axis=0)
+        mask_batch = np.stack([
+            cv2.resize(face_rgb, (128, 128)).astype("float32") / 255.0
+            for face_rgb in faces_rgb
+        ])
+
+    with stage("mask_inference"):
+        mask_preds = run_model("mask", mask_batch)[:, 0]
 
-        mask_pred = mask_model.predict(mask_face, verbose=0)[0][0]
-        print(f"Mask prediction: {mask_pred:.4f}")
+    results = []
+    groups = {"emotion_masked": [], "emotion_regular": []}
+    for i, (face, mask_pred) in enumerate(zip(faces, mask_preds)):
+        print(f"Mask prediction (face {i}): {mask_pred:.4f}")
 
         # Use dynamic mask inversion state
         if mask_inversion_state["inverted"]:
@@ -292,64 +723,246 @@ def predict_emotion_from_path(image_path):
         else:
             mask_detected = mask_pred > 0.5
 
-        if mask_detected:
-            mask_status = "MASK"
-            selected_model = emotion_masked
+        groups["emotion_masked" if mask_detected else "emotion_regular"].append(i)
+        results.append({
+            "bbox": list(face["bbox"]),
+            "detection_confidence": face["confidence"],
+            "mask_status": "MASK" if mask_detected else "NO MASK",
+            "mask_score": float(mask_pred),
+        })
+
+    # --- Emotion prediction: Grayscale, size depends on mask status, normalized ---
+    for model_name, indices in groups.items():
+        if not indices:
+            continue
+        if model_name == "emotion_masked":
             input_size = 128  # emotion_masked uses grayscale 128x128
             labels = masked_labels
         else:
-            mask_status = "NO MASK"
-            selected_model = emotion_regular
             input_size = 48  # emotion_regular uses grayscale 48x48
             labels = regular_labels
 
-        print(f"Mask status: {mask_status}")
-
-        # --- Emotion prediction: Grayscale, size depends on mask status, normalized ---
-        face_gray = cv2.cvtColor(face_rgb, cv2.COLOR_RGB2GRAY)
-        emo_face = cv2.resize(face_gray, (input_size, input_size))
-        emo_face = emo_face.astype("float32") / 255.0
-        emo_face = np.expand_dims(emo_face, axis=-1)
-        emo_face = np.expand_dims(emo_face, axis=0)
-
-        emotion_pred = selected_model.predict(emo_face, verbose=0)
-        emotion_idx = np.argmax(emotion_pred[0])
-        emotion_label = labels[emotion_idx]
-        confidence = float(emotion_pred[0][emotion_idx])
+        with stage("crop_resize"):
+            emo_batch = np.stack([
+                cv2.resize(cv2.cvtColor(faces_rgb[i], cv2.COLOR_RGB2GRAY), (input_size, input_size))
+                .astype("float32") / 255.0
+                for i in indices
+            ])
+            emo_batch = np.expand_dims(emo_batch, axis=-1)
+
+        with stage("emotion_inference"):
+            emotion_preds = run_model(model_name, emo_batch)
+        for i, emotion_pred in zip(indices, emotion_preds):
+            emotion_idx = int(np.argmax(emotion_pred))
+            results[i]["emotion"] = labels[emotion_idx]
+            results[i]["confidence"] = float(emotion_pred[emotion_idx])
+            print(f"Emotion (face {i}): {results[i]['emotion']} ({results[i]['confidence']:.2f}) - {results[i]['mask_status']}")
+
+    return results
+
+def annotate_faces(img_bgr, face_results):
+    """Draws a box and label for every classified face on a copy of the image"""
+    with stage("annotate_encode"):
+        img_copy = img_bgr.copy()
+        for face in face_results:
+            x1, y1, x2, y2 = face["bbox"]
+            cv2.rectangle(img_copy, (x1, y1), (x2, y2), (0, 255, 0), 3)
+            label_text = f"{face['emotion']} ({face['confidence']:.2f}) - {face['mask_status']}"
+            cv2.putText(img_copy, label_text, (x1, max(y1-10, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
+    return img_copy
+
+def decode_image_bytes(data):
+    """
+    Decodes an encoded image (PNG/JPEG/...) held in memory to (BGR array or None, scale).
+    Large images come back reduced by `scale` (see INGEST_MIN_SIDE); pass it on to
+    predict_emotion_cached so boxes are reported in the upload's pixels. Raises
+    ValueError past MAX_IMAGE_BYTES / MAX_IMAGE_PIXELS.
+    """
+    with stage("decode"):
+        return image_ingest.decode(data, INGEST_MIN_SIDE, MAX_IMAGE_BYTES, MAX_IMAGE_PIXELS)
+
+def encode_png(img_bgr):
+    """Encodes a BGR image as PNG bytes, or None"""
+    with stage("annotate_encode"):
+        success, buf = cv2.imencode(".png", img_bgr)
+    return buf.tobytes() if success else None
+
+def png_data_url(png_bytes):
+    return "data:image/png;base64," + base64.b64encode(png_bytes).decode("utf-8")
+
+def encode_png_data_url(img_bgr):
+    """Encodes a BGR image as a base64 PNG data URL without touching the disk"""
+    png_bytes = encode_png(img_bgr)
+    return png_data_url(png_bytes) if png_bytes is not None else None
+
+def store_upload(data, original_name):
+    """Content key of an uploaded image (what emotions.filename records); kept on disk with SAVE_RAW_UPLOADS"""
+    if SAVE_RAW_UPLOADS:
+        return upload_store.put(data, original_name)
+    return upload_store.key_for(data, original_name)
+
+def predict_emotion_from_image(img_bgr, multi_face=False):
+    """
+    Uses OpenCV DNN face detector, then applies your mask_model and emotion models.
+    By default only the largest face is classified; with multi_face=True every
+    detected face is classified in one batched pass.
+    Returns: (result_dict, error_msg, annotated_image_bgr)
+    """
+    try:
+        h_img, w_img = img_bgr.shape[:2]
+        print(f"Image size: {w_img}x{h_img}")
 
-        print(f"Emotion: {emotion_label} ({confidence:.2f})")
+        faces_list = detect_faces(img_bgr)
+        FACES_DETECTED.observe(len(faces_list))
+        if not faces_list:
+            print("❌ No faces detected with confidence > 0.5")
+            PREDICTIONS_TOTAL.inc(outcome="no_face")
+            return None, "No face detected. Please ensure your face is visible and well-lit.", None
 
-        # Annotate image (use BGR for OpenCV drawing)
-        img_copy = img_bgr.copy()
-        cv2.rectangle(img_copy, (x1, y1), (x2, y2), (0, 255, 0), 3)
-        label_text = f"{emotion_label} ({confidence:.2f}) - {mask_status}"
-        cv2.putText(img_copy, label_text, (x1, max(y1-10, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2)
+        if multi_face:
+            chosen = faces_list
+            print(f"✅ Classifying all {len(chosen)} faces")
+        else:
+            # Choose the largest face
+            chosen = faces_list[:1]
+            print(f"✅ Selected face with area {chosen[0]['area']} pixels")
 
-        annotated_path = image_path.replace('.', '_annotated.')
-        success = cv2.imwrite(annotated_path, img_copy)
-        if not success:
-            annotated_path = None
+        face_results = classify_faces(img_bgr, chosen)
+        primary = face_results[0]
 
         result = {
-            "mask_status": mask_status,
-            "emotion": emotion_label,
-            "confidence": confidence,
-            "faces_detected": len(faces_list)
+            "mask_status": primary["mask_status"],
+            "emotion": primary["emotion"],
+            "confidence": primary["confidence"],
+            "faces_detected": len(faces_list),
+            "faces": face_results
         }
-        return result, None, annotated_path
+        PREDICTIONS_TOTAL.inc(outcome="ok")
+        return result, None, annotate_faces(img_bgr, face_results)
 
     except Exception as e:
+        PREDICTIONS_TOTAL.inc(outcome="error")
         print(f"Prediction error: {str(e)}")
         import traceback
         traceback.print_exc()
         return None, f"Prediction error: {str(e)}", None
 
-    except Exception as outer_e:
-        print(f"Unexpected error in predict_emotion_from_path: {outer_e}")
-        return None, f"Unexpected error: {outer_e}", None
+def scale_faces(faces, scale):
+    """Face results with their boxes mapped from a reduced decode back to the upload's pixels"""
+    if scale == 1:
+        return faces
+    return [dict(face, bbox=[v * scale for v in face["bbox"]]) for face in faces]
+
+def in_upload_pixels(result, scale):
+    """Copy of a prediction result with boxes in upload pixels and the decode scale recorded"""
+    if result is None:
+        return None
+    return dict(result, faces=scale_faces(result["faces"], scale), image_scale=scale)
+
+def predict_emotion_cached(img_bgr, multi_face=False, image_scale=1):
+    """
+    predict_emotion_from_image with the result cache in front of it.
+    On a hit only the annotation is redrawn from the cached boxes.
+    img_bgr may be a reduced decode (see decode_image_bytes): the returned boxes are
+    multiplied by `image_scale` into the upload's pixels, and the result carries
+    "image_scale" since the annotated image stays at the decoded size.
+    Returns: (result_dict, error_msg, annotated_image_bgr)
+    """
+    if not ENABLE_RESULT_CACHE:
+        result, error, annotated = predict_emotion_from_image(img_bgr, multi_face=multi_face)
+        return in_upload_pixels(result, image_scale), error, annotated
+
+    key = make_key(img_bgr, mask_inversion_state["inverted"], multi_face, MODEL_VERSION)
+    result = result_cache.get(key)
+    if result is not None:
+        print("✅ Result cache hit")
+        return in_upload_pixels(result, image_scale), None, annotate_faces(img_bgr, result["faces"])
+
+    result, error, annotated = predict_emotion_from_image(img_bgr, multi_face=multi_face)
+    if error is None:
+        result_cache.put(key, result)
+    return in_upload_pixels(result, image_scale), error, annotated
+
+def predict_emotion_from_path(image_path, multi_face=False):
+    """
+    File-based wrapper around predict_emotion_from_image (used by scripts).
+    Returns: (result_dict, error_msg, annotated_image_path)
+    """
+    # Read image in BGR format (OpenCV default), reduced like uploads
+    try:
+        with open(image_path, "rb") as f:
+            img_bgr, scale = decode_image_bytes(f.read())
+    except (OSError, ValueError) as e:
+        return None, str(e), None
+    if img_bgr is None:
+        return None, "Image read error", None
+
+    result, error, annotated = predict_emotion_from_image(img_bgr, multi_face=multi_face)
+    if error:
+        return None, error, None
+    result = in_upload_pixels(result, scale)
+
+    annotated_path = image_path.replace('.', '_annotated.')
+    with stage("annotate_encode"):
+        success = cv2.imwrite(annotated_path, annotated)
+    if not success:
+        annotated_path = None
+    return result, None, annotated_path
+
+
+# ====== Metrics & health checks ======
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text exposition of this process's metrics, labelled with its pid"""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: models loaded and warmed up. Includes per-model load/warmup times."""
+    return jsonify(model_status), (200 if model_status["ready"] else 503)
+
+
+# ====== Authorization ======
+def load_user_role(user_id):
+    with get_db_conn() as conn:
+        result = conn.execute(queries.USER_ROLE, (user_id,)).fetchone()
+    return result[0] if result else None
+
+role_cache = RoleCache(load_user_role, ttl_seconds=ROLE_CACHE_TTL_SECONDS)
 
+def get_user_role(user_id):
+    return role_cache.get(user_id)
+
+def admin_required(fn):
+    """
+    jwt_required() plus an admin check. Tokens carry the role claim from /login;
+    an 'admin' claim is confirmed against role_cache, so the check only reads the
+    database once per ROLE_CACHE_TTL_SECONDS. Tokens issued before the claim
+    existed fall back to the cached role alone.
+    """
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        claimed = get_jwt().get("role")
+        if claimed is not None and claimed != 'admin':
+            return jsonify({"error": "Admin access required"}), 403
+        if get_user_role(int(get_jwt_identity())) != 'admin':
+            return jsonify({"error": "Admin access required"}), 403
+        return fn(*args, **kwargs)
+    return wrapper
 
 # ====== Auth routes ======
+def password_hasher_busy_response():
+    """503 for a request that could not get a password hashing slot in time"""
+    response = jsonify({"error": "Too many sign-in requests, try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @app.route("/register", methods=["POST"])
 def register():
     """
@@ -372,7 +985,10 @@ def register():
     if find_user_by_email(email) is not None:
         return jsonify({"error": "Email already registered"}), 400
 
-    user_id = create_user(fullname, email, password)
+    try:
+        user_id = create_user(fullname, email, password)
+    except TimeoutError:
+        return password_hasher_busy_response()
     return jsonify({"message": "User created", "user_id": user_id}), 201
 
 @app.route("/login", methods=["POST"])
@@ -388,30 +1004,23 @@ def login():
     if not email or not password:
         return jsonify({"error": "email and password required"}), 400
 
-    user = find_user_by_email(email)
-    if user is None:
-        return jsonify({"error": "Invalid credentials"}), 401
-
-    # Re-fetch user details including role
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, password_hash, role, fullname FROM users WHERE email = ?", (email,))
-    row = cur.fetchone()
-    conn.close()
-
+    row = find_user_by_email(email)
     if row is None:
         return jsonify({"error": "Invalid credentials"}), 401
 
-    user_id = row[0]
-    password_hash = row[1]
-    role = row[2] if len(row) > 2 else "user"
-    fullname = row[3] if len(row) > 3 else "User"
+    user_id = row["id"]
+    role = row["role"] or "user"
+    fullname = row["fullname"] or "User"
 
-    if not check_password_hash(password_hash, password):
-        return jsonify({"error": "Invalid credentials"}), 401
-
-    # Create access token with identity = user_id (must be string)
-    access_token = create_access_token(identity=str(user_id))
+    try:
+        if not password_hasher.verify(row["password_hash"], password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except TimeoutError:
+        return password_hasher_busy_response()
+
+    # Create access token with identity = user_id (must be string); the role claim
+    # lets admin routes authorize without reading the users table (see admin_required)
+    access_token = create_access_token(identity=str(user_id), additional_claims={"role": role})
     print(f"LOGIN SUCCESS: Created token for user_id {user_id}, role: {role}")
     print(f"Token created: {access_token[:50]}...")
 
@@ -429,33 +1038,56 @@ def predict():
         return jsonify({"error": "No image uploaded"}), 400
 
     file = request.files["image"]
-    file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(file_path)
+    image_bytes = file.read()
+    try:
+        image_ingest.check_limits(image_bytes, MAX_IMAGE_BYTES, MAX_IMAGE_PIXELS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
 
     try:
-        if mask_model is None or emotion_regular is None or emotion_masked is None:
-            return jsonify({"error": "Models not loaded"}), 500
-            
-        result, error, annotated_image = predict_emotion_from_path(file_path)
+        unavailable = models_unavailable_response()
+        if unavailable:
+            return unavailable
+
+        try:
+            img_bgr, image_scale = decode_image_bytes(image_bytes)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 413
+        if img_bgr is None:
+            return jsonify({"error": "Image read error"}), 400
+        # Disk errors while storing the upload end up in the handler below
+        image_key = store_upload(image_bytes, file.filename)
+
+        # multi_face=true classifies every detected face instead of only the largest
+        multi_face = request.values.get("multi_face", "false").lower() in ("1", "true", "yes")
+
+        result, error, annotated_image = predict_emotion_cached(img_bgr, multi_face=multi_face,
+                                                                image_scale=image_scale)
         if error:
             return jsonify({"error": error}), 400
         
         user_id = int(get_jwt_identity())
-        save_emotion(user_id, file.filename, result["emotion"])
+        # One transaction (and one data_version bump) for all faces
+        save_emotions([(user_id, image_key, face["emotion"]) for face in result["faces"]])
 
         response_data = {
             "prediction": result["emotion"],
             "mask_status": result["mask_status"],
             "emotion": result["emotion"],
-            "faces_detected": result.get("faces_detected", 1)
+            "faces_detected": result.get("faces_detected", 1),
+            # The annotated image (and any boxes drawn on it) is this many times smaller
+            "image_scale": result["image_scale"]
         }
+        if multi_face:
+            response_data["faces"] = result["faces"]
         
-        # If multiple faces detected, return annotated image
-        if annotated_image:
-            import base64
-            with open(annotated_image, 'rb') as img_file:
-                img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                response_data["annotated_image"] = f"data:image/png;base64,{img_data}"
+        # Return the annotated image, encoded in memory
+        if annotated_image is not None:
+            png_bytes = encode_png(annotated_image)
+            if png_bytes is not None:
+                response_data["annotated_image"] = png_data_url(png_bytes)
+                if SAVE_ANNOTATED_UPLOADS:
+                    upload_store.put_annotated(image_key, png_bytes)
 
         return jsonify(response_data), 200
     
@@ -464,26 +1096,281 @@ def predict():
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
 
-@app.route("/weekly_summary", methods=["GET"])
+# ====== Batch prediction endpoint ======
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+def _read_batch_images():
+    """
+    Collects (filename, bytes) from multipart 'images' files and/or a zip in 'archive'.
+    The image count and total unzipped size are checked against the zip directory before
+    any member is inflated: raises ValueError for more than BATCH_ENDPOINT_MAX_IMAGES
+    images and OverflowError for more than BATCH_MAX_INFLATED_BYTES.
+    """
+    files = request.files.getlist("images")
+    archive = request.files.get("archive")
+    zf = zipfile.ZipFile(io.BytesIO(archive.read())) if archive is not None else None
+    try:
+        members = [
+            info for info in (zf.infolist() if zf is not None else [])
+            if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+        if len(files) + len(members) > BATCH_ENDPOINT_MAX_IMAGES:
+            raise ValueError(f"Too many images (max {BATCH_ENDPOINT_MAX_IMAGES})")
+
+        items = [(file.filename, file.read()) for file in files]
+        total = sum(len(data) for _, data in items)
+        # A member never inflates past the size in its header (zipfile stops there), and
+        # members over the per-image limit are not inflated at all
+        total += sum(info.file_size for info in members if info.file_size <= MAX_IMAGE_BYTES)
+        if total > BATCH_MAX_INFLATED_BYTES:
+            raise OverflowError(f"Images add up to more than {BATCH_MAX_INFLATED_BYTES} bytes")
+
+        for info in members:
+            items.append((info.filename, zf.read(info) if info.file_size <= MAX_IMAGE_BYTES else None))
+        return items
+    finally:
+        if zf is not None:
+            zf.close()
+
+def _predict_batch_item(filename, data, multi_face):
+    if data is None:
+        return {"filename": filename, "error": f"Image larger than {MAX_IMAGE_BYTES} bytes"}
+    # Errors are reported per item: raising here would end the stream mid-batch
+    try:
+        img_bgr, image_scale = decode_image_bytes(data)
+    except ValueError as e:
+        return {"filename": filename, "error": str(e)}
+    if img_bgr is None:
+        return {"filename": filename, "error": "Image read error"}
+    try:
+        image_key = store_upload(data, filename)
+    except OSError as e:
+        return {"filename": filename, "error": f"Could not store image: {e}"}
+
+    result, error, _ = predict_emotion_cached(img_bgr, multi_face=multi_face, image_scale=image_scale)
+    if error:
+        return {"filename": filename, "error": error}
+    return {
+        "filename": filename,
+        "image_key": image_key,
+        "prediction": result["emotion"],
+        "mask_status": result["mask_status"],
+        "emotion": result["emotion"],
+        "confidence": result["confidence"],
+        "faces_detected": result["faces_detected"],
+        "faces": result["faces"],
+        "image_scale": result["image_scale"]
+    }
+
+@app.route("/predict/batch", methods=["POST"])
 @jwt_required()
-def weekly_summary():
+def predict_batch():
+    """
+    Multipart: several 'images' files and/or one 'archive' zip; optional multi_face=true.
+    Streams one NDJSON line per image as it completes, then a summary line.
+    All emotion rows are written in a single transaction at the end.
+    """
+    unavailable = models_unavailable_response()
+    if unavailable:
+        return unavailable
+
+    try:
+        items = _read_batch_images()
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Invalid zip archive"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except OverflowError as e:
+        return jsonify({"error": str(e)}), 413
+
+    if not items:
+        return jsonify({"error": "No images uploaded"}), 400
+
     user_id = int(get_jwt_identity())
+    multi_face = request.values.get("multi_face", "false").lower() in ("1", "true", "yes")
+
+    def generate():
+        rows = []
+        failed = 0
+        # Detection runs in parallel threads; their crops meet in the model micro-batchers
+        with ThreadPoolExecutor(max_workers=BATCH_ENDPOINT_WORKERS) as pool:
+            futures = [pool.submit(_predict_batch_item, name, data, multi_face) for name, data in items]
+            for future in as_completed(futures):
+                item = future.result()
+                if "error" in item:
+                    failed += 1
+                else:
+                    rows.extend((user_id, item["image_key"], face["emotion"]) for face in item["faces"])
+                yield json.dumps(item) + "\n"
+
+        save_emotions(rows)
+        yield json.dumps({
+            "done": True,
+            "images": len(items),
+            "failed": failed,
+            "saved": len(rows)
+        }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+# ====== Asynchronous prediction jobs ======
+@app.route("/predict/async", methods=["POST"])
+@jwt_required()
+def predict_async():
+    """
+    Multipart: 'image' file; optional multi_face=true and priority (higher runs first).
+    Returns 202 with a job id; poll /predict/jobs/<job_id> for the result.
+    """
+    if "image" not in request.files:
+        return jsonify({"error": "No image uploaded"}), 400
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
+    try:
+        priority = int(request.values.get("priority", 0))
+    except ValueError:
+        return jsonify({"error": "priority must be an integer"}), 400
 
-    # Fetch last 7 days of user emotion data
-    cur.execute("""
-        SELECT emotion, timestamp 
-        FROM emotions
-        WHERE user_id = ? 
-          AND timestamp >= datetime('now', '-7 days')
-        ORDER BY timestamp ASC
-    """, (user_id,))
+    file = request.files["image"]
+    multi_face = request.values.get("multi_face", "false").lower() in ("1", "true", "yes")
+    user_id = int(get_jwt_identity())
+    image_bytes = file.read()
+    try:
+        image_ingest.check_limits(image_bytes, MAX_IMAGE_BYTES, MAX_IMAGE_PIXELS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    try:
+        image_key = store_upload(image_bytes, file.filename)
+    except OSError as e:
+        print(f"Upload store error: {e}")
+        return jsonify({"error": f"Could not store image: {e}"}), 500
+
+    job_id = job_queue.enqueue(user_id, image_key, image_bytes,
+                               params={"multi_face": multi_face,
+                                       "inverted": mask_inversion_state["inverted"]},
+                               priority=priority)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route("/predict/jobs/<int:job_id>", methods=["GET"])
+@jwt_required()
+def predict_job_status(job_id):
+    user_id = int(get_jwt_identity())
+    job = job_queue.get(job_id)
+    if job is None or (job["user_id"] != user_id and get_user_role(user_id) != 'admin'):
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/admin/jobs/stats", methods=["GET"])
+@admin_required
+def admin_job_stats():
+    """Queue depth and status counts for the async prediction queue"""
+    return jsonify(job_queue.stats())
+
+
+# ====== Live stream endpoint (WebSocket) ======
+def _stream_frame(img_bgr, tracker, multi_face):
+    """Detect or track faces on one stream frame, then classify them. Returns (faces, detected)."""
+    detected = tracker.needs_detection()
+    faces = [] if detected else tracker.update(img_bgr)
+    if not faces:
+        # Scheduled re-detection, or the tracker lost a face
+        detected = True
+        faces = detect_faces(img_bgr)
+        if not multi_face:
+            faces = faces[:1]
+        tracker.reset(img_bgr, faces)
+
+    if not faces:
+        return [], detected
+    return classify_faces(img_bgr, faces), detected
+
+if Sock is not None:
+    sock = Sock(app)
+
+    @sock.route("/predict/stream")
+    def predict_stream(ws):
+        """
+        WebSocket: /predict/stream?token=<jwt>[&multi_face=true]
+        The client sends encoded frames (JPEG/PNG) as binary messages; the server
+        replies with one JSON message per processed frame. Frames that arrive
+        while the previous one is still being processed are dropped.
+        Stream results are not written to the emotions table.
+        """
+        try:
+            claims = decode_token(request.args.get("token", ""))
+        except Exception as e:
+            ws.send(json.dumps({"error": "Invalid token", "msg": str(e)}))
+            return
+
+        if not model_status["ready"]:
+            ws.send(json.dumps({"error": "Models not loaded"}))
+            return
+
+        multi_face = request.args.get("multi_face", "false").lower() in ("1", "true", "yes")
+        frames = LatestFrame()
+        tracker = FaceTracker(STREAM_DETECT_EVERY, STREAM_TRACK_MIN_CONFIDENCE)
+        print(f"Stream opened for user_id {claims['sub']}")
+
+        def process_frames():
+            processed = 0
+            while True:
+                data = frames.get()
+                if data is None:
+                    break
+                try:
+                    try:
+                        img_bgr, image_scale = decode_image_bytes(data)
+                    except ValueError as e:
+                        ws.send(json.dumps({"error": str(e)}))
+                        continue
+                    if img_bgr is None:
+                        ws.send(json.dumps({"error": "Image read error"}))
+                        continue
+
+                    faces, detected = _stream_frame(img_bgr, tracker, multi_face)
+                    processed += 1
+                    ws.send(json.dumps({
+                        "frame": processed,
+                        "detected": detected,
+                        "faces_detected": len(faces),
+                        "faces": scale_faces(faces, image_scale),
+                        "image_scale": image_scale,
+                        "received": frames.received,
+                        "dropped": frames.dropped
+                    }))
+                except Exception as e:
+                    # Nothing would read the frames any more: end the stream so the
+                    # client reconnects instead of sending into the void
+                    print(f"Stream error: {e}")
+                    try:
+                        ws.send(json.dumps({"error": f"Stream error: {e}"}))
+                        ws.close()
+                    except Exception:
+                        pass
+                    break
+
+        worker = threading.Thread(target=process_frames, name="stream-inference", daemon=True)
+        worker.start()
+        try:
+            while worker.is_alive():
+                data = ws.receive()
+                if data is None or data == "close":
+                    break
+                if isinstance(data, bytes):
+                    frames.put(data)
+        finally:
+            frames.close()
+            worker.join(timeout=5)
+            print(f"Stream closed: {frames.received} frames received, {frames.dropped} dropped")
 
-    rows = cur.fetchall()
-    conn.close()
+
+@app.route("/weekly_summary", methods=["GET"])
+@jwt_required()
+def weekly_summary():
+    user_id = int(get_jwt_identity())
+
+    # Fetch last 7 days of user emotion counts (one row per day and emotion)
+    with get_db_conn() as conn:
+        rows = conn.execute(queries.WEEKLY_SUMMARY, (user_id, since_day(7))).fetchall()
 
     if not rows:
         return jsonify({"message": "No data for weekly summary"}), 200
@@ -494,18 +1381,18 @@ def weekly_summary():
 
     for row in rows:
         emotion = row["emotion"]
-        date_only = row["timestamp"].split("T")[0]
+        date_only = row["day"]
 
         # Daily grouping
         if date_only not in daily_data:
             daily_data[date_only] = {"Happy": 0, "Sad": 0}
 
-        daily_data[date_only][emotion] += 1
+        daily_data[date_only][emotion] += row["count"]
 
         # Weekly overall count
         if emotion not in emotion_count:
             emotion_count[emotion] = 0
-        emotion_count[emotion] += 1
+        emotion_count[emotion] += row["count"]
 
     # Most predicted emotion
     most_frequent = max(emotion_count, key=emotion_count.get)
@@ -533,97 +1420,190 @@ def weekly_summary():
         "quote": quote
     })
 
+# ====== Keyset pagination ======
+def encode_cursor(row):
+    value = f"{row['ts'] or 0}:{row['id']}"
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip("=")
+
+def decode_cursor(value):
+    padded = value + "=" * (-len(value) % 4)
+    ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+    return int(ts), int(row_id)
+
+def read_page_args(default_limit):
+    """limit / cursor / direction query args -> (limit, cursor, newer). Raises ValueError."""
+    try:
+        limit = int(request.args.get("limit", default_limit))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    direction = request.args.get("direction", "older")
+    if direction not in ("older", "newer"):
+        raise ValueError("direction must be 'older' or 'newer'")
+
+    cursor = request.args.get("cursor")
+    try:
+        cursor = decode_cursor(cursor) if cursor else None
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if direction == "newer" and cursor is None:
+        raise ValueError("direction 'newer' needs a cursor")
+    return limit, cursor, direction == "newer"
+
+def read_date_arg(name, end=False):
+    """'YYYY-MM-DD' (or full ISO datetime) query arg -> epoch seconds; date-only ends include that day"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date (YYYY-MM-DD)")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return int(parsed.timestamp())
+
+def fetch_emotions_page(conn, limit, cursor, newer, **filters):
+    """
+    One page of emotions rows, newest first, plus cursors for the neighbouring pages:
+    pass next_cursor back to get older rows, prev_cursor with direction=newer for newer ones.
+    """
+    sql, params = queries.emotions_page(limit + 1, cursor, newer, **filters)
+    rows = conn.execute(sql, params).fetchall()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if newer:
+        rows.reverse()
+        has_newer, has_older = more, bool(rows)
+    else:
+        has_newer, has_older = cursor is not None and bool(rows), more
+
+    emotions = []
+    for row in rows:
+        item = dict(row)
+        item.pop("ts")
+        emotions.append(item)
+    return {
+        "emotions": emotions,
+        "next_cursor": encode_cursor(rows[-1]) if has_older else None,
+        "prev_cursor": encode_cursor(rows[0]) if has_newer else None,
+        "has_more": has_older,
+    }
+
 # ====== Optional: route to get current user's predictions ======
 @app.route("/my_emotions", methods=["GET"])
 @jwt_required()
 def my_emotions():
+    """
+    Newest first, EMOTIONS_PAGE_SIZE per page.
+    Query: limit, cursor (next_cursor/prev_cursor of a previous page), direction=older|newer
+    """
     user_id = int(get_jwt_identity())
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT id, filename, emotion, timestamp FROM emotions WHERE user_id = ? ORDER BY timestamp DESC", (user_id,))
-    rows = cur.fetchall()
-    conn.close()
-    results = [dict(r) for r in rows]
-    return jsonify({"emotions": results})
+    try:
+        limit, cursor, newer = read_page_args(EMOTIONS_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with get_db_conn() as conn:
+        page = fetch_emotions_page(conn, limit, cursor, newer, user_id=user_id)
+        if cursor is None:
+            # Whole-history counts come from the rollups, not from the page
+            by_emotion = {row["emotion"]: row["count"]
+                          for row in conn.execute(queries.USER_EMOTION_TOTALS, (user_id,))}
+            page["totals"] = {"total": sum(by_emotion.values()), "by_emotion": by_emotion}
+    return jsonify(page)
+
+# ====== Admin snapshots ======
+admin_snapshots = SnapshotCache(ADMIN_SNAPSHOT_MAX_ENTRIES)
+
+def snapshot_response(build):
+    """
+    Serve an admin GET from the snapshot cache. build() returns the JSON payload and only
+    runs when nothing is cached for the current data version (bumped by every write, in
+    any process). Responses carry an ETag and If-None-Match requests get a 304.
 
-# ====== Admin Routes ======
-def get_user_role(user_id):
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT role FROM users WHERE id = ?", (user_id,))
-    result = cur.fetchone()
-    conn.close()
-    return result[0] if result else None
+    If-Modified-Since is not honoured: it has one-second resolution and cannot express
+    the day rollover in the key, so it could return a stale 304. Last-Modified is
+    still sent for information.
+    """
+    with get_db_conn() as conn:
+        version, updated_at = conn.execute(queries.DATA_VERSION).fetchone()
+    # Date-windowed payloads (last 30 days, ...) also change at midnight without any write
+    key = f"{datetime.now().date().isoformat()} {request.full_path}"
+    etag = f"{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+    last_modified = datetime.fromtimestamp(math.ceil(updated_at), timezone.utc)
+
+    if request.if_none_match.contains(etag):
+        admin_snapshots.record_not_modified()
+        response = Response(status=304)
+    else:
+        body = admin_snapshots.get(key, version) if ENABLE_ADMIN_SNAPSHOTS else None
+        if body is None:
+            body = jsonify(build()).get_data()
+            if ENABLE_ADMIN_SNAPSHOTS:
+                admin_snapshots.put(key, version, body)
+        response = Response(body, mimetype="application/json")
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Browsers may keep the body but must revalidate (JWT-protected data)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
+# ====== Admin Routes ======
 @app.route("/admin/dashboard", methods=["GET"])
-@jwt_required()
+@admin_required
 def admin_dashboard():
-    user_id = int(get_jwt_identity())
-    role = get_user_role(user_id)
-    if role != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Get total users
-    cur.execute("SELECT COUNT(*) as total FROM users WHERE role = 'user'")
-    total_users = cur.fetchone()['total']
-    
-    # Get total emotions
-    cur.execute("SELECT COUNT(*) as total FROM emotions")
-    total_emotions = cur.fetchone()['total']
-    
-    # Get emotions by type
-    cur.execute("SELECT emotion, COUNT(*) as count FROM emotions GROUP BY emotion")
-    emotion_stats = [dict(row) for row in cur.fetchall()]
-    
-    # Get recent users (last 10)
-    cur.execute("SELECT id, fullname, email, created_at FROM users WHERE role = 'user' ORDER BY created_at DESC LIMIT 10")
-    recent_users = [dict(row) for row in cur.fetchall()]
-    
-    # Get daily emotion counts for last 30 days
-    cur.execute("""
-        SELECT DATE(timestamp) as date, emotion, COUNT(*) as count 
-        FROM emotions 
-        WHERE timestamp >= datetime('now', '-30 days')
-        GROUP BY DATE(timestamp), emotion
-        ORDER BY date DESC
-    """)
-    daily_emotions = [dict(row) for row in cur.fetchall()]
-    
-    conn.close()
-    
-    return jsonify({
-        "total_users": total_users,
-        "total_emotions": total_emotions,
-        "emotion_stats": emotion_stats,
-        "recent_users": recent_users,
-        "daily_emotions": daily_emotions
-    })
+    def build():
+        with get_db_conn() as conn:
+            cur = conn.cursor()
+            # Get total users
+            cur.execute(queries.COUNT_USERS)
+            total_users = cur.fetchone()['total']
+
+            # Get total emotions
+            cur.execute(queries.COUNT_EMOTIONS)
+            total_emotions = cur.fetchone()['total']
+
+            # Get emotions by type
+            cur.execute(queries.EMOTION_TOTALS)
+            emotion_stats = [dict(row) for row in cur.fetchall()]
+
+            # Get recent users (last 10)
+            cur.execute(queries.RECENT_USERS)
+            recent_users = [dict(row) for row in cur.fetchall()]
+
+            # Get daily emotion counts for last 30 days
+            cur.execute(queries.DAILY_EMOTIONS_30D, (since_day(30),))
+            daily_emotions = [dict(row) for row in cur.fetchall()]
+
+        return {
+            "total_users": total_users,
+            "total_emotions": total_emotions,
+            "emotion_stats": emotion_stats,
+            "recent_users": recent_users,
+            "daily_emotions": daily_emotions
+        }
+
+    return snapshot_response(build)
 
 @app.route("/admin/users", methods=["GET"])
-@jwt_required()
+@admin_required
 def admin_get_users():
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT id, fullname, email, role, created_at FROM users ORDER BY created_at DESC")
-    users = [dict(row) for row in cur.fetchall()]
-    conn.close()
-    return jsonify({"users": users})
+    def build():
+        with get_db_conn() as conn:
+            rows = conn.execute(queries.ALL_USERS).fetchall()
+        users = [dict(row) for row in rows]
+        return {"users": users}
+
+    return snapshot_response(build)
 
 @app.route("/admin/users/create", methods=["POST"])
-@jwt_required()
+@admin_required
 def admin_create_user():
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
     data = request.get_json(force=True)
     fullname = data.get("fullname")
     email = data.get("email")
@@ -647,16 +1627,20 @@ def admin_create_user():
         return jsonify({"error": "Email already registered"}), 400
 
     # Create user with specified role
-    pwd_hash = generate_password_hash(password)
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO users (fullname, email, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?)",
-        (fullname, email, pwd_hash, role, datetime.now().isoformat())
-    )
-    conn.commit()
-    user_id = cur.lastrowid
-    conn.close()
+    try:
+        pwd_hash = password_hasher.hash(password)
+    except TimeoutError:
+        return password_hasher_busy_response()
+    created_at, created_ts = now_timestamps()
+    with db.transaction() as cur:
+        cur.execute(
+            "INSERT INTO users (fullname, email, password_hash, role, created_at, created_ts) VALUES (?, ?, ?, ?, ?, ?)",
+            (fullname, email, pwd_hash, role, created_at, created_ts)
+        )
+        user_id = cur.lastrowid
+        bump_data_version(cur)
+    # Row ids can be reused after a delete, so drop any role cached for this id
+    role_cache.invalidate(user_id)
 
     return jsonify({
         "message": "User created successfully",
@@ -665,89 +1649,83 @@ def admin_create_user():
     }), 201
 
 @app.route("/admin/users/<int:user_id>", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def admin_delete_user(user_id):
-    admin_id = int(get_jwt_identity())
-    if get_user_role(admin_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    conn = get_db_conn()
-    cur = conn.cursor()
-    
-    # Delete user's emotions first
-    cur.execute("DELETE FROM emotions WHERE user_id = ?", (user_id,))
-    
-    # Delete user
-    cur.execute("DELETE FROM users WHERE id = ? AND role = 'user'", (user_id,))
-    
-    if cur.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "User not found or cannot delete admin"}), 404
-    
-    conn.commit()
-    conn.close()
+    with get_db_conn() as conn:
+        cur = conn.cursor()
+
+        # Delete user's emotions first
+        rollups.unrecord_user(cur, user_id)
+        cur.execute("DELETE FROM emotions WHERE user_id = ?", (user_id,))
+
+        # Delete user
+        cur.execute("DELETE FROM users WHERE id = ? AND role = 'user'", (user_id,))
+
+        if cur.rowcount == 0:
+            conn.rollback()
+            return jsonify({"error": "User not found or cannot delete admin"}), 404
+
+        bump_data_version(cur)
+        conn.commit()
+    role_cache.invalidate(user_id)
     return jsonify({"message": "User deleted successfully"})
 
 @app.route("/admin/emotions", methods=["GET"])
-@jwt_required()
+@admin_required
 def admin_get_emotions():
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT e.id, e.filename, e.emotion, e.timestamp, u.fullname, u.email
-        FROM emotions e
-        JOIN users u ON e.user_id = u.id
-        ORDER BY e.timestamp DESC
-        LIMIT 100
-    """)
-    emotions = [dict(row) for row in cur.fetchall()]
-    conn.close()
-    return jsonify({"emotions": emotions})
+    """
+    Newest first, ADMIN_EMOTIONS_PAGE_SIZE per page.
+    Query: limit, cursor, direction=older|newer (see /my_emotions),
+           emotion, from / to (YYYY-MM-DD, inclusive)
+    """
+    try:
+        limit, cursor, newer = read_page_args(ADMIN_EMOTIONS_PAGE_SIZE)
+        start_ts = read_date_arg("from")
+        end_ts = read_date_arg("to", end=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        with get_db_conn() as conn:
+            return fetch_emotions_page(
+                conn, limit, cursor, newer,
+                emotion=request.args.get("emotion") or None,
+                start_ts=start_ts,
+                end_ts=end_ts,
+                with_user=True,
+            )
+
+    return snapshot_response(build)
 
 @app.route("/admin/emotions/<int:emotion_id>", methods=["DELETE"])
-@jwt_required()
+@admin_required
 def admin_delete_emotion(emotion_id):
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    conn = get_db_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM emotions WHERE id = ?", (emotion_id,))
-    
-    if cur.rowcount == 0:
-        conn.close()
+    with db.transaction() as cur:
+        rollups.unrecord_emotion(cur, emotion_id)
+        cur.execute("DELETE FROM emotions WHERE id = ?", (emotion_id,))
+        deleted = cur.rowcount
+        if deleted:
+            bump_data_version(cur)
+
+    if deleted == 0:
         return jsonify({"error": "Emotion record not found"}), 404
-    
-    conn.commit()
-    conn.close()
     return jsonify({"message": "Emotion record deleted successfully"})
 
 
 
 @app.route("/admin/mask-logic", methods=["GET"])
-@jwt_required()
+@admin_required
 def admin_get_mask_logic():
     """Get current mask inversion logic state"""
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    
     return jsonify({
         "inverted": mask_inversion_state["inverted"],
         "description": "If true: mask_pred < 0.5 = MASK, mask_pred >= 0.5 = NO MASK"
     })
 
 @app.route("/admin/mask-logic/toggle", methods=["POST"])
-@jwt_required()
+@admin_required
 def admin_toggle_mask_logic():
     """Toggle mask inversion logic"""
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    
     # Toggle the state
     mask_inversion_state["inverted"] = not mask_inversion_state["inverted"]
     
@@ -759,57 +1737,144 @@ def admin_toggle_mask_logic():
         "message": f"Mask logic {'inverted' if mask_inversion_state['inverted'] else 'normal'}"
     })
 
-@app.route("/admin/stats", methods=["GET"])
-@jwt_required()
-def admin_stats():
-    user_id = int(get_jwt_identity())
-    if get_user_role(user_id) != 'admin':
-        return jsonify({"error": "Admin access required"}), 403
-    conn = get_db_conn()
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Users registered per month
-    cur.execute("""
-        SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as count
-        FROM users 
-        WHERE role = 'user'
-        GROUP BY strftime('%Y-%m', created_at)
-        ORDER BY month DESC
-        LIMIT 12
-    """)
-    monthly_users = [dict(row) for row in cur.fetchall()]
-    
-    # Emotions per day (last 30 days)
-    cur.execute("""
-        SELECT DATE(timestamp) as date, COUNT(*) as count
-        FROM emotions
-        WHERE timestamp >= datetime('now', '-30 days')
-        GROUP BY DATE(timestamp)
-        ORDER BY date DESC
-    """)
-    daily_activity = [dict(row) for row in cur.fetchall()]
-    
-    # Top active users
-    cur.execute("""
-        SELECT u.fullname, u.email, COUNT(e.id) as emotion_count
-        FROM users u
-        LEFT JOIN emotions e ON u.id = e.user_id
-        WHERE u.role = 'user'
-        GROUP BY u.id
-        ORDER BY emotion_count DESC
-        LIMIT 10
-    """)
-    top_users = [dict(row) for row in cur.fetchall()]
-    
-    conn.close()
-    
+@app.route("/admin/batching/stats", methods=["GET"])
+@admin_required
+def admin_batching_stats():
+    """Queue depth and batch-size statistics for each model batcher"""
     return jsonify({
-        "monthly_users": monthly_users,
-        "daily_activity": daily_activity,
-        "top_users": top_users
+        "enabled": bool(batchers),
+        "batchers": [b.stats() for b in batchers.values()]
     })
 
+@app.route("/admin/password-hasher/stats", methods=["GET"])
+@admin_required
+def admin_password_hasher_stats():
+    """Work factor, pool size and call counts of the password hashing pool"""
+    return jsonify(password_hasher.stats())
+
+@app.route("/admin/uploads/stats", methods=["GET"])
+@admin_required
+def admin_upload_stats():
+    """Retention settings, write/dedup counts and the last sweep of the upload store"""
+    stats = upload_store.stats()
+    stats["save_raw"] = SAVE_RAW_UPLOADS
+    stats["save_annotated"] = SAVE_ANNOTATED_UPLOADS
+    return jsonify(stats)
+
+@app.route("/admin/uploads/gc", methods=["POST"])
+@admin_required
+def admin_upload_gc():
+    """Apply the upload retention policy now instead of waiting for the next sweep"""
+    summary = upload_store.sweep(force=True)
+    if summary is None:
+        return jsonify({"error": "A sweep is already running"}), 409
+    return jsonify(summary)
+
+@app.route("/admin/write-buffer/stats", methods=["GET"])
+@admin_required
+def admin_write_buffer_stats():
+    """Queue depth and flush statistics of the emotion write-behind buffer"""
+    stats = emotion_writer.stats()
+    stats["enabled"] = ENABLE_WRITE_BUFFER
+    stats["synchronous"] = DB_SYNCHRONOUS
+    return jsonify(stats)
+
+@app.route("/admin/cache/stats", methods=["GET"])
+@admin_required
+def admin_cache_stats():
+    """Hit/miss counters and size of the prediction result cache"""
+    stats = result_cache.stats()
+    stats["enabled"] = ENABLE_RESULT_CACHE
+    stats["admin_snapshots"] = admin_snapshots.stats()
+    stats["roles"] = role_cache.stats()
+    return jsonify(stats)
+
+@app.route("/admin/cache/clear", methods=["POST"])
+@admin_required
+def admin_clear_cache():
+    result_cache.clear()
+    admin_snapshots.clear()
+    role_cache.clear()
+    return jsonify({"message": "Result cache cleared"})
+
+@app.route("/admin/profiler", methods=["GET"])
+@admin_required
+def admin_profiler_status():
+    return jsonify(profiler.status())
+
+@app.route("/admin/profiler", methods=["POST"])
+@admin_required
+def admin_profiler_configure():
+    """
+    JSON body: { "sample_rate": 0.05 } or { "next_n": 10 },
+    optional "mode": "cprofile" | "sample" and "route_prefix" (default "/predict").
+    { "enabled": false } turns the profiler off.
+    Applies to every prefork worker (see profiler.py for what profiles do not include).
+    """
+    data = request.get_json(force=True)
+    if data.get("enabled") is False:
+        profiler.disable()
+        return jsonify(profiler.status())
+
+    try:
+        profiler.enable(
+            sample_rate=data.get("sample_rate"),
+            next_n=data.get("next_n"),
+            mode=data.get("mode", "cprofile"),
+            route_prefix=data.get("route_prefix", "/predict")
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    print(f"Profiler enabled by admin {get_jwt_identity()}: {profiler.status()}")
+    return jsonify(profiler.status())
+
+@app.route("/admin/profiles", methods=["GET"])
+@admin_required
+def admin_list_profiles():
+    return jsonify({"profiles": profiler.list_profiles()})
+
+@app.route("/admin/profiles/<filename>", methods=["GET"])
+@admin_required
+def admin_download_profile(filename):
+    """Download a stored profile; ?format=text renders a cProfile file as a pstats summary"""
+    path = profiler.profile_path(filename)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+
+    if request.args.get("format") == "text" and filename.endswith(".prof"):
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(50)
+        return Response(out.getvalue(), mimetype="text/plain")
+    return send_file(path, as_attachment=True)
+
+@app.route("/admin/stats", methods=["GET"])
+@admin_required
+def admin_stats():
+    def build():
+        with get_db_conn() as conn:
+            cur = conn.cursor()
+
+            # Users registered per month
+            cur.execute(queries.MONTHLY_USERS, (since_month_start(11),))
+            monthly_users = [dict(row) for row in cur.fetchall()]
+
+            # Emotions per day (last 30 days)
+            cur.execute(queries.DAILY_ACTIVITY_30D, (since_day(30),))
+            daily_activity = [dict(row) for row in cur.fetchall()]
+
+            # Top active users
+            cur.execute(queries.TOP_USERS)
+            top_users = [dict(row) for row in cur.fetchall()]
+
+        return {
+            "monthly_users": monthly_users,
+            "daily_activity": daily_activity,
+            "top_users": top_users
+        }
+
+    return snapshot_response(build)
+
 
 
 if __name__ == "__main__":
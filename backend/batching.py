@@ -0,0 +1,126 @@
+"""
+Dynamic micro-batching for model inference.
+
+Concurrent /predict requests each submit their preprocessed face crops to a
+MicroBatcher. A background thread collects samples for at most
+`max_wait_ms` (or until `max_batch_size` samples are queued), stacks them into
+one tensor, runs the model once and routes each output row back to the
+request that submitted it.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects single samples from many threads and runs them as one batch"""
+
+    def __init__(self, predict_fn, name, max_batch_size=16, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        # Statistics
+        self._batches = 0
+        self._samples = 0
+        self._largest_batch = 0
+        self._batch_sizes = {}
+        self._last_batch_ms = 0.0
+
+    # ---------- public API ----------
+    def submit(self, sample):
+        """Queue one sample (without batch axis). Returns a Future for its output row."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((sample, future))
+        return future
+
+    def predict(self, samples):
+        """Blocking helper: submit every sample and return the stacked outputs"""
+        futures = [self.submit(sample) for sample in samples]
+        return np.stack([f.result() for f in futures])
+
+    def stats(self):
+        with self._lock:
+            avg = (self._samples / self._batches) if self._batches else 0.0
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "samples": self._samples,
+                "avg_batch_size": round(avg, 2),
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "last_batch_ms": round(self._last_batch_ms, 2),
+            }
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so start one lazily in every process
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid:
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue()
+            self._worker_pid = pid
+            self._worker = threading.Thread(
+                target=self._run, name=f"batcher-{self.name}", daemon=True
+            )
+            self._worker.start()
+
+    def _collect(self):
+        """Block for the first sample, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            samples = [item[0] for item in batch]
+            futures = [item[1] for item in batch]
+
+            start = time.perf_counter()
+            try:
+                outputs = self.predict_fn(np.stack(samples))
+            except Exception as e:
+                print(f"Batcher '{self.name}' error: {e}")
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+            for f, row in zip(futures, outputs):
+                f.set_result(row)
+
+            size = len(batch)
+            with self._lock:
+                self._batches += 1
+                self._samples += size
+                self._largest_batch = max(self._largest_batch, size)
+                self._batch_sizes[size] = self._batch_sizes.get(size, 0) + 1
+                self._last_batch_ms = elapsed_ms
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the /predict pipeline over a directory of images.
+
+Every image goes through the same functions /predict uses (decode_image_bytes,
+predict_emotion_from_image, save_emotions, encode_png_data_url) while the
+per-stage timers from instrumentation.py record where the time goes:
+decode, blob, ssd_forward, crop_resize, mask_inference, emotion_inference,
+annotate_encode and db_write. The corpus is replayed at each concurrency level
+to measure throughput. DB writes go to a scratch copy of the schema, never to
+database.db, and the result cache is off unless --cache is given.
+
+Usage:
+    python benchmark_pipeline.py corpus/ --concurrency 1 4 8 --output bench.json
+    python benchmark_pipeline.py corpus/ --baseline bench_baseline.json
+    python benchmark_pipeline.py corpus/ --output bench_baseline.json   # record a new baseline
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from instrumentation import STAGES, collect_stages
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+PERCENTILES = (50, 90, 99)
+
+# A regression must be at least this slow in absolute terms to be reported (noise floor)
+MIN_REGRESSION_MS = 0.5
+
+
+def summarize(values_ms):
+    if not values_ms:
+        return None
+    arr = np.asarray(values_ms)
+    summary = {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in PERCENTILES}
+    summary["mean"] = round(float(arr.mean()), 3)
+    summary["max"] = round(float(arr.max()), 3)
+    summary["count"] = int(arr.size)
+    return summary
+
+
+def process_image(app, path, multi_face, user_id):
+    """One /predict-equivalent pass. Returns (stage timings in seconds, total seconds, error)."""
+    with collect_stages() as timings:
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+
+        error = None
+        try:
+            img_bgr, image_scale = app.decode_image_bytes(data)
+        except ValueError as e:
+            img_bgr, error = None, str(e)
+        if img_bgr is None:
+            error = error or "Image read error"
+        else:
+            result, error, annotated = app.predict_emotion_cached(img_bgr, multi_face=multi_face,
+                                                                  image_scale=image_scale)
+            if error is None:
+                app.save_emotions([(user_id, os.path.basename(path), face["emotion"]) for face in result["faces"]])
+                app.encode_png_data_url(annotated)
+        total = time.perf_counter() - start
+    return dict(timings), total, error
+
+
+def run_level(app, images, concurrency, repeat, multi_face):
+    jobs = images * repeat
+    stage_ms = {name: [] for name in STAGES}
+    total_ms = []
+    errors = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for timings, total, error in pool.map(lambda p: process_image(app, p, multi_face, 1), jobs):
+            total_ms.append(total * 1000.0)
+            errors += error is not None
+            for name, seconds in timings.items():
+                stage_ms.setdefault(name, []).append(seconds * 1000.0)
+    wall = time.perf_counter() - start
+
+    return {
+        "images": len(jobs),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_ips": round(len(jobs) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "total": summarize(total_ms),
+            **{name: summarize(values) for name, values in stage_ms.items() if values},
+        },
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns a list of human-readable regressions"""
+    regressions = []
+    for level, run in results["runs"].items():
+        base = baseline.get("runs", {}).get(level)
+        if base is None:
+            continue
+
+        if run["throughput_ips"] < base["throughput_ips"] * (1 - tolerance):
+            regressions.append(
+                f"c={level} throughput {run['throughput_ips']} img/s vs baseline {base['throughput_ips']}"
+            )
+
+        for name, current in run["latency_ms"].items():
+            previous = base["latency_ms"].get(name)
+            if not current or not previous:
+                continue
+            for key in ("p50", "p99"):
+                if (current[key] > previous[key] * (1 + tolerance)
+                        and current[key] - previous[key] >= MIN_REGRESSION_MS):
+                    regressions.append(
+                        f"c={level} {name} {key} {current[key]} ms vs baseline {previous[key]} ms"
+                    )
+    return regressions
+
+
+def print_run(level, run):
+    print(f"\n📊 Concurrency {level}: {run['throughput_ips']} img/s "
+          f"({run['images']} images, {run['errors']} errors, {run['wall_seconds']}s)")
+    print(f"   {'stage':<18}{'p50':>10}{'p90':>10}{'p99':>10}{'mean':>10}")
+    for name in ("total",) + STAGES:
+        stats = run["latency_ms"].get(name)
+        if stats:
+            print(f"   {name:<18}{stats['p50']:>10}{stats['p90']:>10}{stats['p99']:>10}{stats['mean']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the MaskLens prediction pipeline")
+    parser.add_argument("images", help="Directory of images to replay")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the corpus this many times per level")
+    parser.add_argument("--multi-face", action="store_true")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown vs baseline (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.images, f) for f in os.listdir(args.images)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        return 1
+
+    import app
+    if not app.wait_for_models():
+        print(f"❌ Models failed to load: {app.model_status['error']}")
+        return 1
+
+    # Never write benchmark rows into the real database
+    scratch_dir = tempfile.mkdtemp(prefix="masklens-bench-")
+    app.open_database(os.path.join(scratch_dir, "bench.db"))
+    app.init_db()
+    app.ENABLE_RESULT_CACHE = args.cache
+
+    # Unmeasured pass so lazy initialisation does not land in the first level
+    process_image(app, images[0], args.multi_face, 1)
+
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(),
+            "corpus": os.path.abspath(args.images),
+            "corpus_images": len(images),
+            "backend": app.INFERENCE_BACKEND,
+            "variant": app.MODEL_VARIANT,
+            "micro_batching": app.ENABLE_MICRO_BATCHING,
+            "multi_face": args.multi_face,
+            "cache": args.cache,
+        },
+        "runs": {},
+    }
+
+    print("=" * 60)
+    print(f"MASKLENS PIPELINE BENCHMARK ({len(images)} images)")
+    print("=" * 60)
+    for level in args.concurrency:
+        run = run_level(app, images, level, args.repeat, args.multi_face)
+        results["runs"][str(level)] = run
+        print_run(level, run)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print(f"\n✅ No regressions vs {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
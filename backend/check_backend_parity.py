@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare model outputs across inference backends.
+
+Runs the same inputs through every available backend and reports the largest
+absolute difference from the Keras reference plus how many decisions flip
+(mask threshold for the mask model, argmax label for the emotion models).
+Inputs are random unless --images points at a folder of face crops.
+
+Usage:
+    python check_backend_parity.py
+    python check_backend_parity.py --backends keras tflite --images uploads
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from model_backends import BACKENDS, MODEL_FILES, MODEL_INPUT_SHAPES, load_backend, load_sample_inputs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_inputs(model_name, count, image_dir=None):
+    if not image_dir:
+        rng = np.random.default_rng(0)
+        return rng.random((count,) + MODEL_INPUT_SHAPES[model_name], dtype=np.float32)
+    try:
+        return load_sample_inputs(model_name, image_dir, count)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+def decisions(model_name, outputs):
+    if model_name == "mask":
+        return outputs[:, 0] > 0.5
+    return np.argmax(outputs, axis=1)
+
+
+def check_parity(backends, count, image_dir, tolerance, model_dir=BASE_DIR):
+    all_ok = True
+    for model_name in MODEL_FILES:
+        inputs = build_inputs(model_name, count, image_dir)
+        print(f"\n📊 {model_name} ({len(inputs)} samples)")
+
+        reference = load_backend("keras", model_name, model_dir).predict(inputs)
+        for backend in backends:
+            if backend == "keras":
+                continue
+            try:
+                outputs = load_backend(backend, model_name, model_dir).predict(inputs)
+            except Exception as e:
+                print(f"   ⚠️ {backend}: skipped ({e})")
+                continue
+
+            max_diff = float(np.max(np.abs(outputs - reference)))
+            flips = int(np.sum(decisions(model_name, outputs) != decisions(model_name, reference)))
+            ok = max_diff <= tolerance and flips == 0
+            all_ok = all_ok and ok
+            status = "✅" if ok else "❌"
+            print(f"   {status} {backend}: max |diff| = {max_diff:.6f}, decision flips = {flips}")
+    return all_ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that inference backends agree with Keras")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--samples", type=int, default=32)
+    parser.add_argument("--images", help="Folder of face crops to use instead of random inputs")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Maximum allowed absolute difference")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MASKLENS BACKEND PARITY CHECK")
+    print("=" * 60)
+    ok = check_parity(args.backends, args.samples, args.images, args.tolerance)
+    print("\n✅ All backends agree" if ok else "\n❌ Backend outputs differ")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Fail if a hot query (queries.HOT_QUERIES) is planned as a full table scan.
+
+Builds a scratch database with the current migrations (or uses --db), runs
+EXPLAIN QUERY PLAN on every hot query and prints the plans. A plan step that
+scans a table without an index makes the script exit with status 1, so it can
+run in CI after any schema or query change. Keyset pages
+(queries.PAGE_QUERIES) additionally fail if they sort in a temp b-tree, since
+that means reading every matching row instead of one page.
+
+Usage:
+    python check_query_plans.py
+    python check_query_plans.py --db database.db --verbose
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+from migrations import migrate
+from queries import HOT_QUERIES, PAGE_QUERIES
+
+# One row per emotion label: size does not grow with history, so a scan is fine
+BOUNDED_TABLES = {"emotion_totals"}
+
+
+def explain(conn, sql):
+    params = (0,) * sql.count("?")
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def is_table_scan(detail):
+    # "SCAN emotions" is a full scan; "SCAN e USING INDEX ..." walks an index in order
+    if not detail.startswith("SCAN ") or "INDEX" in detail:
+        return False
+    return detail.split()[1] not in BOUNDED_TABLES
+
+
+def check(conn, verbose=False):
+    failures = []
+    for name, sql in {**HOT_QUERIES, **PAGE_QUERIES}.items():
+        plan = explain(conn, sql)
+        scans = [detail for detail in plan if is_table_scan(detail)]
+        if name in PAGE_QUERIES:
+            scans += [detail for detail in plan if detail.startswith("USE TEMP B-TREE FOR ORDER BY")]
+        status = "FAIL" if scans else "ok"
+        print(f"{status:4}  {name}")
+        if verbose or scans:
+            for detail in plan:
+                print(f"        {detail}")
+        if scans:
+            failures.append(name)
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check hot query plans for table scans")
+    parser.add_argument("--db", help="Existing database to check (default: fresh scratch database)")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not just failures")
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(args.db)
+    else:
+        scratch_dir = tempfile.mkdtemp(prefix="masklens-plans-")
+        conn = sqlite3.connect(os.path.join(scratch_dir, "plans.db"))
+    migrate(conn)
+
+    failures = check(conn, args.verbose)
+    conn.close()
+    if failures:
+        print(f"\n❌ {len(failures)} hot queries scan or sort a table: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"\n✅ All {len(HOT_QUERIES) + len(PAGE_QUERIES)} hot queries use indexes")
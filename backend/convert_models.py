@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Export the three Keras .h5 models to TFLite and ONNX so the server can run them
+with a lighter runtime (see model_backends.py / INFERENCE_BACKEND in app.py).
+
+Usage:
+    python convert_models.py                 # both formats
+    python convert_models.py --format onnx   # only ONNX (needs tf2onnx)
+"""
+
+import argparse
+import os
+import sys
+
+from model_backends import MODEL_FILES, model_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def export_tflite(model, output_path):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, output_path):
+    import tensorflow as tf
+    import tf2onnx
+    signature = [tf.TensorSpec([None] + list(model.input_shape[1:]), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=output_path)
+
+
+EXPORTERS = {
+    "tflite": export_tflite,
+    "onnx": export_onnx,
+}
+
+
+def convert_models(formats, model_dir=BASE_DIR):
+    from tensorflow.keras.models import load_model
+
+    for model_name in MODEL_FILES:
+        source = model_path(model_name, "keras", model_dir)
+        print(f"\nLoading {source}...")
+        model = load_model(source)
+        print(f"   Input shape: {model.input_shape}")
+
+        for fmt in formats:
+            target = model_path(model_name, fmt, model_dir)
+            try:
+                EXPORTERS[fmt](model, target)
+                size_kb = os.path.getsize(target) / 1024
+                print(f"   ✅ {fmt}: {target} ({size_kb:.0f} KB)")
+            except Exception as e:
+                print(f"   ❌ {fmt} export failed: {e}")
+                return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert MaskLens .h5 models to TFLite / ONNX")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), action="append",
+                        help="Format to export (repeatable, default: all)")
+    parser.add_argument("--model-dir", default=BASE_DIR, help="Directory containing the .h5 models")
+    args = parser.parse_args()
+
+    print("🔄 Converting MaskLens models...")
+    ok = convert_models(args.format or sorted(EXPORTERS), args.model_dir)
+    if ok:
+        print("\n🎉 Conversion complete! Run check_backend_parity.py to verify outputs.")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,107 @@
+"""
+Managed SQLite connections.
+
+Database keeps a pool of long-lived connections instead of opening a new one
+for every query. Each connection is set up once with WAL journaling (readers
+no longer block on writers), a busy timeout, the configured synchronous level
+and page cache size, and keeps its own prepared-statement cache
+(`cached_statements`) across requests. Pools are per process, so a forked
+worker never reuses its parent's connections.
+
+    with db.connection() as conn:      # reads
+        rows = conn.execute(...).fetchall()
+
+    with db.transaction() as cur:      # writes, committed on success
+        cur.execute(...)
+"""
+
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+
+class Database:
+    def __init__(self, path, pool_size=8, busy_timeout_ms=5000, synchronous="NORMAL",
+                 cache_size_kb=16384, cached_statements=256, isolation_level="",
+                 factory=sqlite3.Connection):
+        self.path = path
+        self.pool_size = pool_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.cached_statements = cached_statements
+        self.isolation_level = isolation_level
+        self.factory = factory
+
+        self._pool = queue.LifoQueue()
+        self._pid = os.getpid()
+        self._wal_enabled = False
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000.0,
+            isolation_level=self.isolation_level,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=self.factory,
+        )
+        conn.row_factory = sqlite3.Row
+        if not self._wal_enabled:
+            # journal_mode is stored in the database file, so once is enough
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._wal_enabled = True
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self):
+        if self._pid != os.getpid():
+            # Forked child: drop the parent's connections without closing them
+            self._pool = queue.LifoQueue()
+            self._pid = os.getpid()
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._pid == os.getpid() and self._pool.qsize() < self.pool_size:
+            self._pool.put(conn)
+        else:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection (rows are sqlite3.Row)"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and yield a cursor; commits on success, rolls back on error"""
+        conn = self._acquire()
+        try:
+            cur = conn.cursor()
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
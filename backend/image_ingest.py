@@ -0,0 +1,110 @@
+"""
+Size-aware decoding of uploaded images.
+
+The face detector sees a 300x300 blob and the classifiers a 128x128 or 48x48
+crop, so decoding a 12 MP phone photo at full resolution mostly produces
+pixels that are thrown away. decode() reads the width and height from the
+PNG IHDR / JPEG SOF header first and asks OpenCV for the smallest
+IMREAD_REDUCED_COLOR_{2,4,8} scale that still leaves `min_side` pixels on
+the short side, which keeps faces large enough to crop. JPEGs are scaled
+inside the DCT, so both decode time and memory drop with the square of the
+factor; other formats are decoded in full and downscaled by OpenCV.
+
+The same header check enforces the byte and pixel limits before any pixel is
+decoded; both raise ValueError with a message meant for the client. Other
+formats (BMP, WebP, TIFF, ...) are bounded by OpenCV's own decoder limit,
+OPENCV_IO_MAX_IMAGE_PIXELS, which app.py sets before cv2 is first imported.
+The header helpers need neither OpenCV nor NumPy; only decode() imports them.
+"""
+
+import struct
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Start-of-frame markers carry the dimensions (DHT C4, JPG C8 and DAC CC do not)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_REDUCED_FLAGS = {
+    2: "IMREAD_REDUCED_COLOR_2",
+    4: "IMREAD_REDUCED_COLOR_4",
+    8: "IMREAD_REDUCED_COLOR_8",
+}
+
+
+def image_size(data):
+    """(width, height) from a PNG or JPEG header, or None for other or truncated data"""
+    if data[:8] == _PNG_SIGNATURE and data[12:16] == b"IHDR" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # No length field
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):  # End of image / start of scan before any frame header
+            return None
+        (length,) = struct.unpack(">H", data[i + 2:i + 4])
+        if marker in _JPEG_SOF:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduced_scale(width, height, min_side):
+    """Largest factor in (8, 4, 2) that keeps the short side at least `min_side`, else 1"""
+    short_side = min(width, height)
+    for factor in (8, 4, 2):
+        if short_side // factor >= min_side:
+            return factor
+    return 1
+
+
+def check_limits(data, max_bytes=None, max_pixels=None):
+    """
+    Raise ValueError if the encoded size or the header dimensions exceed the
+    limits. Returns (width, height) when the header could be read, else None.
+    """
+    if max_bytes is not None and len(data) > max_bytes:
+        raise ValueError(f"Image is {len(data)} bytes (max {max_bytes})")
+    size = image_size(data)
+    if size is not None and max_pixels is not None and size[0] * size[1] > max_pixels:
+        raise ValueError(f"Image is {size[0]}x{size[1]} pixels (max {max_pixels})")
+    return size
+
+
+def decode(data, min_side=None, max_bytes=None, max_pixels=None):
+    """
+    Decode to BGR, reduced to keep `min_side` pixels on the short side (None:
+    full resolution). Returns (image, factor): multiply coordinates in the
+    image by `factor` to get the upload's pixels. image is None if the data
+    cannot be decoded.
+    """
+    import cv2
+    import numpy as np
+
+    size = check_limits(data, max_bytes, max_pixels)
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None, 1
+
+    factor = 1
+    if size is not None and min_side:
+        factor = reduced_scale(size[0], size[1], min_side)
+    img = cv2.imdecode(buf, getattr(cv2, _REDUCED_FLAGS.get(factor, "IMREAD_COLOR")))
+
+    # Formats without a parsed header are only checked here once decoded
+    # (OpenCV has already refused anything past OPENCV_IO_MAX_IMAGE_PIXELS)
+    if img is not None and size is None and max_pixels is not None:
+        h, w = img.shape[:2]
+        if w * h > max_pixels:
+            raise ValueError(f"Image is {w}x{h} pixels (max {max_pixels})")
+    return img, factor
@@ -0,0 +1,62 @@
+"""
+Per-stage timing for the prediction pipeline.
+
+Pipeline code wraps each step in `with stage("ssd_forward"):`. Durations go to
+any registered stage observers (app.py feeds the /metrics histograms this way)
+and, when the current thread is inside `collect_stages()`, into a per-request
+dict, which is how the benchmark harness (benchmark_pipeline.py) gets its
+breakdown. With neither, stage() does not even read the clock.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Stage names, in pipeline order
+STAGES = (
+    "decode",
+    "blob",
+    "ssd_forward",
+    "crop_resize",
+    "mask_inference",
+    "emotion_inference",
+    "annotate_encode",
+    "db_write",
+)
+
+_local = threading.local()
+_observers = []
+
+
+def add_stage_observer(fn):
+    """Register fn(stage_name, seconds), called after every timed stage"""
+    _observers.append(fn)
+
+
+@contextmanager
+def stage(name):
+    timings = getattr(_local, "timings", None)
+    if timings is None and not _observers:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+        for fn in _observers:
+            fn(name, elapsed)
+
+
+@contextmanager
+def collect_stages():
+    """Collect stage durations (seconds) for the code run in this block on this thread"""
+    timings = {}
+    previous = getattr(_local, "timings", None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
@@ -0,0 +1,154 @@
+"""
+Durable prediction job queue backed by a local SQLite file.
+
+/predict/async enqueues the uploaded image and returns a job id straight away;
+worker processes (job_worker.py) claim jobs by priority, run the prediction
+and store the result. Failed jobs are retried up to `max_attempts` times, and
+jobs left 'running' by a crashed worker are reclaimed after `stale_after`
+seconds; once such a job has used up its attempts it is marked failed.
+
+Connections come from a db.Database pool in autocommit mode, so every
+statement commits on its own and claim() manages its transaction explicitly.
+"""
+
+import json
+import sqlite3
+import time
+
+from db import Database
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    def __init__(self, path, max_attempts=3, stale_after=300, pool_size=4):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.stale_after = stale_after
+        # Autocommit mode so claim() can take the write lock with BEGIN IMMEDIATE
+        self.db = Database(path, pool_size=pool_size, busy_timeout_ms=30000, isolation_level=None)
+        self._init_db()
+
+    def _init_db(self):
+        with self.db.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    filename TEXT,
+                    params TEXT,
+                    payload BLOB,
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority DESC, id)")
+
+    # ---------- producer side ----------
+    def enqueue(self, user_id, filename, payload, params=None, priority=0):
+        with self.db.connection() as conn:
+            cur = conn.execute(
+                """INSERT INTO jobs (user_id, status, priority, max_attempts, filename, params, payload, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (user_id, QUEUED, priority, self.max_attempts, filename,
+                 json.dumps(params or {}), sqlite3.Binary(payload), time.time())
+            )
+            job_id = cur.lastrowid
+        return job_id
+
+    def get(self, job_id):
+        """Job status without the payload, or None"""
+        with self.db.connection() as conn:
+            row = conn.execute(
+                """SELECT id, user_id, status, priority, attempts, filename, result, error,
+                          created_at, started_at, finished_at
+                   FROM jobs WHERE id = ?""",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def stats(self):
+        with self.db.connection() as conn:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+            for row in conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status"):
+                counts[row["status"]] = row["count"]
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            retried = conn.execute("SELECT COUNT(*) FROM jobs WHERE attempts > 1").fetchone()[0]
+        return {
+            "queue_depth": counts[QUEUED],
+            "by_status": counts,
+            "retried_jobs": retried,
+            "oldest_queued_seconds": round(time.time() - oldest, 1) if oldest else 0.0,
+        }
+
+    # ---------- worker side ----------
+    def claim(self, worker):
+        """Atomically take the highest-priority queued (or stale running) job. Returns a dict or None."""
+        now = time.time()
+        with self.db.connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                # A job that keeps killing its worker must not be reclaimed forever
+                conn.execute(
+                    """UPDATE jobs SET status = ?, error = ?, payload = NULL, finished_at = ?
+                       WHERE status = ? AND started_at < ? AND attempts >= max_attempts""",
+                    (FAILED, "Worker did not finish the job on any attempt", now,
+                     RUNNING, now - self.stale_after)
+                )
+                row = conn.execute(
+                    """SELECT id, user_id, filename, params, payload, attempts FROM jobs
+                       WHERE status = ? OR (status = ? AND started_at < ? AND attempts < max_attempts)
+                       ORDER BY priority DESC, id
+                       LIMIT 1""",
+                    (QUEUED, RUNNING, now - self.stale_after)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, started_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        job = dict(row)
+        job["attempts"] += 1
+        job["params"] = json.loads(job["params"] or "{}")
+        return job
+
+    def complete(self, job_id, result):
+        with self.db.connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, payload = NULL, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error, retry=True):
+        """Record a failure; the job goes back to the queue while attempts remain"""
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if retry and row is not None and row["attempts"] < row["max_attempts"]:
+                conn.execute("UPDATE jobs SET status = ?, error = ? WHERE id = ?", (QUEUED, error, job_id))
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, payload = NULL, finished_at = ? WHERE id = ?",
+                    (FAILED, error, time.time(), job_id)
+                )
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Worker pool for /predict/async jobs.
+
+Each worker is a separate process that imports app.py (and so loads its own
+copy of the models), then drains the SQLite job queue.
+
+Usage:
+    python job_worker.py --workers 2
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+
+def run_worker(poll_interval=0.5):
+    """Worker process main loop"""
+    import app  # Loads the models in this process
+
+    if not app.wait_for_models():
+        print(f"❌ Job worker {os.getpid()}: models failed to load: {app.model_status['error']}")
+        return
+
+    # A job is marked done right after its rows are saved, so commit them synchronously
+    app.ENABLE_WRITE_BUFFER = False
+
+    worker = f"{os.uname().nodename}:{os.getpid()}"
+    print(f"Job worker {worker} ready")
+
+    while True:
+        job = app.job_queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        print(f"Worker {worker}: job {job['id']} (attempt {job['attempts']})")
+        try:
+            try:
+                img_bgr, image_scale = app.decode_image_bytes(job["payload"])
+            except ValueError as e:
+                # Over the ingest limits: retrying will not help
+                app.job_queue.fail(job["id"], str(e), retry=False)
+                continue
+            if img_bgr is None:
+                app.job_queue.fail(job["id"], "Image read error", retry=False)
+                continue
+
+            multi_face = job["params"].get("multi_face", False)
+            # Job workers are separate processes: apply the mask logic active at enqueue time
+            if "inverted" in job["params"]:
+                app.mask_inversion_state["inverted"] = job["params"]["inverted"]
+            result, error, _ = app.predict_emotion_cached(img_bgr, multi_face=multi_face,
+                                                          image_scale=image_scale)
+            if error:
+                # No face / bad image will not change on retry
+                app.job_queue.fail(job["id"], error, retry=False)
+                continue
+
+            app.save_emotions([(job["user_id"], job["filename"], face["emotion"]) for face in result["faces"]])
+            app.job_queue.complete(job["id"], {
+                "prediction": result["emotion"],
+                "mask_status": result["mask_status"],
+                "emotion": result["emotion"],
+                "faces_detected": result["faces_detected"],
+                "faces": result["faces"],
+                "image_scale": result["image_scale"]
+            })
+        except Exception as e:
+            print(f"Worker {worker}: job {job['id']} failed: {e}")
+            app.job_queue.fail(job["id"], f"Prediction failed: {e}")
+
+
+def start_workers(count, poll_interval=0.5):
+    """Start `count` worker processes and return them"""
+    ctx = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        p = ctx.Process(target=run_worker, args=(poll_interval,), name=f"job-worker-{i}", daemon=True)
+        p.start()
+        processes.append(p)
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run MaskLens async prediction workers")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds to sleep when the queue is empty")
+    args = parser.parse_args()
+
+    print(f"Starting {args.workers} job worker(s)...")
+    workers = start_workers(args.workers, args.poll_interval)
+    try:
+        while True:
+            # Replace workers that died (e.g. out of memory) so the pool stays at full size
+            for i, p in enumerate(workers):
+                if not p.is_alive():
+                    print(f"Worker {p.name} exited with code {p.exitcode}, restarting")
+                    ctx = multiprocessing.get_context("spawn")
+                    workers[i] = ctx.Process(target=run_worker, args=(args.poll_interval,), name=p.name, daemon=True)
+                    workers[i].start()
+            time.sleep(2)
+    except KeyboardInterrupt:
+        print("Stopping job workers")
@@ -0,0 +1,193 @@
+"""
+Versioned schema migrations for the MaskLens database.
+
+The schema version is kept in SQLite's `PRAGMA user_version`. migrate()
+applies every migration newer than that, each one in its own BEGIN IMMEDIATE
+transaction together with the version bump, so a failed step leaves the
+database at the previous version and concurrent processes (prefork workers,
+job workers) never apply the same step twice.
+
+To change the schema, append a new function to MIGRATIONS; never edit one
+that has already shipped.
+
+Usage:
+    python migrations.py --db database.db
+"""
+
+import argparse
+import sqlite3
+
+
+def _initial_schema(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fullname TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS emotions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            filename TEXT,
+            emotion TEXT,
+            timestamp TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+
+def _user_roles(cur):
+    # Databases created by reset_database.py already have the column
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(users)")]
+    if "role" not in columns:
+        cur.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
+
+
+def _hot_query_indexes(cur):
+    # /my_emotions and /weekly_summary: one user's rows by time
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_emotions_user_ts ON emotions(user_id, timestamp)")
+    # Admin dashboard/stats date windows and the latest-records list
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_emotions_ts ON emotions(timestamp)")
+    # Per-emotion totals without reading the table
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_emotions_emotion ON emotions(emotion)")
+    # Admin user lists and counts filtered by role, newest first
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_role_created ON users(role, created_at)")
+
+
+def _epoch_timestamps(cur):
+    # Integer UTC epoch seconds next to the local ISO strings the API returns.
+    # Range filters and ordering use these columns so they can walk an index
+    # instead of comparing strings against datetime('now', ...) per row.
+    cur.execute("ALTER TABLE emotions ADD COLUMN ts INTEGER")
+    cur.execute("ALTER TABLE users ADD COLUMN created_ts INTEGER")
+    # The ISO strings were written in server local time
+    cur.execute("UPDATE emotions SET ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)")
+    cur.execute("UPDATE users SET created_ts = CAST(strftime('%s', created_at, 'utc') AS INTEGER)")
+
+    cur.execute("DROP INDEX IF EXISTS idx_emotions_user_ts")
+    cur.execute("DROP INDEX IF EXISTS idx_emotions_ts")
+    cur.execute("DROP INDEX IF EXISTS idx_users_role_created")
+    cur.execute("CREATE INDEX idx_emotions_user_ts ON emotions(user_id, ts)")
+    cur.execute("CREATE INDEX idx_emotions_ts ON emotions(ts)")
+    cur.execute("CREATE INDEX idx_users_role_created ON users(role, created_ts)")
+
+
+def _daily_rollups(cur):
+    # Per-day counts kept up to date by rollups.py; backfilled here from existing rows
+    cur.execute("""
+        CREATE TABLE emotion_daily_user (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            emotion TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day, emotion)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE emotion_daily (
+            day TEXT NOT NULL,
+            emotion TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, emotion)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        CREATE TABLE emotion_totals (
+            emotion TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cur.execute("""
+        INSERT INTO emotion_daily_user (user_id, day, emotion, count)
+        SELECT user_id, substr(timestamp, 1, 10), emotion, COUNT(*)
+        FROM emotions
+        WHERE user_id IS NOT NULL AND timestamp IS NOT NULL AND emotion IS NOT NULL
+        GROUP BY user_id, substr(timestamp, 1, 10), emotion
+    """)
+    cur.execute("""
+        INSERT INTO emotion_daily (day, emotion, count)
+        SELECT day, emotion, SUM(count) FROM emotion_daily_user GROUP BY day, emotion
+    """)
+    cur.execute("""
+        INSERT INTO emotion_totals (emotion, count)
+        SELECT emotion, SUM(count) FROM emotion_daily GROUP BY emotion
+    """)
+
+
+def _emotion_time_index(cur):
+    # Admin emotion filter pages in (ts, id) order; totals now come from the rollups
+    cur.execute("DROP INDEX IF EXISTS idx_emotions_emotion")
+    cur.execute("CREATE INDEX idx_emotions_emotion_ts ON emotions(emotion, ts)")
+
+
+def _data_version(cur):
+    # Single row bumped by every write that changes what admin pages show; caches
+    # in any process compare against it (see app.snapshot_response)
+    cur.execute("""
+        CREATE TABLE data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    cur.execute("INSERT INTO data_version (id, version, updated_at) VALUES (1, 1, strftime('%s', 'now'))")
+
+
+# (version, description, function); versions are consecutive from 1
+MIGRATIONS = [
+    (1, "users and emotions tables", _initial_schema),
+    (2, "users.role column", _user_roles),
+    (3, "indexes for hot queries", _hot_query_indexes),
+    (4, "integer epoch timestamps", _epoch_timestamps),
+    (5, "daily emotion rollups", _daily_rollups),
+    (6, "emotion + time index for paging", _emotion_time_index),
+    (7, "data version for cache invalidation", _data_version),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Bring the database up to `target`. Returns the list of versions applied."""
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version > target:
+            break
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-check under the write lock: another process may have got here first
+            if current_version(conn) >= version:
+                conn.rollback()
+                continue
+            fn(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply MaskLens schema migrations")
+    parser.add_argument("--db", default="database.db", help="SQLite database file")
+    parser.add_argument("--target", type=int, default=LATEST_VERSION, help="Stop at this version")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    before = current_version(conn)
+    applied = migrate(conn, args.target)
+    print(f"{args.db}: version {before} -> {current_version(conn)} ({len(applied)} applied)")
+    conn.close()
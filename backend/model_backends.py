@@ -0,0 +1,208 @@
+"""
+Pluggable inference backends for the mask and emotion models.
+
+Every backend exposes the same `predict(batch) -> np.ndarray` call so the rest
+of the app does not care which runtime executes the model:
+
+    keras        tensorflow.keras model.predict() (original behaviour)
+    tf_function  Keras model wrapped in a compiled tf.function, called directly
+    tflite       TensorFlow Lite interpreter (tflite_runtime if installed)
+    onnx         ONNX Runtime CPU session
+
+The TFLite and ONNX files are produced from the .h5 models by convert_models.py.
+Runtimes are imported lazily so a worker using tflite/onnx never imports TensorFlow.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+BACKENDS = ("keras", "tf_function", "tflite", "onnx")
+# Backends whose loaded models survive fork() (TensorFlow's runtime threads do not)
+FORK_SAFE_BACKENDS = ("tflite", "onnx")
+
+# Base file names (without extension) of the three models
+MODEL_FILES = {
+    "mask": "mask_detection_model",
+    "emotion_regular": "emotion_model_regular",
+    "emotion_masked": "emotion_model_masked",
+}
+
+# Input shape (H, W, C) of each model
+MODEL_INPUT_SHAPES = {
+    "mask": (128, 128, 3),
+    "emotion_regular": (48, 48, 1),
+    "emotion_masked": (128, 128, 1),
+}
+
+# Precision variants; float16/int8 are TFLite files produced by quantize_models.py
+MODEL_VARIANTS = ("float32", "float16", "int8")
+
+BACKEND_EXTENSIONS = {
+    "keras": ".h5",
+    "tf_function": ".h5",
+    "tflite": ".tflite",
+    "onnx": ".onnx",
+}
+
+
+def model_path(model_name, backend="keras", model_dir=".", variant="float32"):
+    """Path of the file a backend loads for a model ("mask", "emotion_regular", ...)"""
+    suffix = "" if variant == "float32" else f"_{variant}"
+    return os.path.join(model_dir, MODEL_FILES[model_name] + suffix + BACKEND_EXTENSIONS[backend])
+
+
+def load_sample_inputs(model_name, image_dir, count):
+    """
+    Loads up to `count` face crops from a folder, preprocessed the way app.py
+    feeds them to `model_name`. Used for calibration and parity checks.
+    """
+    import cv2
+    height, width, channels = MODEL_INPUT_SHAPES[model_name]
+    files = sorted(f for f in os.listdir(image_dir) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    batch = []
+    for name in files:
+        if len(batch) >= count:
+            break
+        img = cv2.imread(os.path.join(image_dir, name))
+        if img is None:
+            continue
+        if channels == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        else:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        img = cv2.resize(img, (width, height)).astype("float32") / 255.0
+        batch.append(img.reshape(height, width, channels))
+    if not batch:
+        raise ValueError(f"No readable images in {image_dir}")
+    return np.stack(batch)
+
+
+class ModelBackend:
+    """Common interface: predict a float32 batch shaped (N, H, W, C)"""
+
+    backend = None
+
+    def __init__(self, path):
+        self.path = path
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.path}>"
+
+
+class KerasBackend(ModelBackend):
+    backend = "keras"
+
+    def __init__(self, path):
+        super().__init__(path)
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFFunctionBackend(ModelBackend):
+    """Calls the Keras model through a traced tf.function, skipping predict()'s per-call setup"""
+
+    backend = "tf_function"
+
+    def __init__(self, path):
+        super().__init__(path)
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+
+        # Batch axis left dynamic so one trace serves every batch size
+        signature = tf.TensorSpec([None] + list(self.model.input_shape[1:]), tf.float32)
+        self._fn = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[signature]
+        )
+
+    def predict(self, batch):
+        return self._fn(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+class TFLiteBackend(ModelBackend):
+    backend = "tflite"
+
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=path)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+
+            if self._input["dtype"] != np.float32:
+                # Fully-integer model: quantize the input with its own scale/zero point
+                scale, zero_point = self._input["quantization"]
+                batch = np.round(batch / scale + zero_point).astype(self._input["dtype"])
+
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+
+            if self._output["dtype"] != np.float32:
+                scale, zero_point = self._output["quantization"]
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output
+
+
+class OnnxBackend(ModelBackend):
+    backend = "onnx"
+
+    def __init__(self, path):
+        super().__init__(path)
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+_BACKEND_CLASSES = {
+    "keras": KerasBackend,
+    "tf_function": TFFunctionBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def load_backend(backend, model_name, model_dir=".", variant="float32"):
+    """Load one model ("mask", "emotion_regular", "emotion_masked") with the given backend"""
+    if backend not in _BACKEND_CLASSES:
+        raise ValueError(f"Unknown inference backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant '{variant}'. Choose one of: {', '.join(MODEL_VARIANTS)}")
+    if variant != "float32" and backend != "tflite":
+        raise ValueError(f"The {variant} variant is only available with the tflite backend")
+    path = model_path(model_name, backend, model_dir, variant)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found (run convert_models.py for tflite/onnx, quantize_models.py for float16/int8)"
+        )
+    return _BACKEND_CLASSES[backend](path)
@@ -0,0 +1,103 @@
+"""
+Password hashing off the request threads.
+
+PBKDF2 is deliberately slow, and a burst of logins (everyone signing in at
+shift start) would otherwise spend every core on it while /predict waits.
+PasswordHasher runs generate_password_hash / check_password_hash on its own
+small thread pool instead: at most `max_workers` hashes run at once (hashlib
+releases the GIL, so that is also the number of cores hashing can take), and
+at most `max_pending` may wait for a slot. A caller that cannot get a slot
+within `wait_timeout` seconds gets TimeoutError, which the routes turn into a
+503 rather than letting the backlog grow.
+
+The work factor is the PBKDF2 iteration count, written into every new hash
+("pbkdf2:sha256:<iterations>$salt$hash"). Existing hashes keep verifying
+with the iterations they were created with.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasher:
+    def __init__(self, iterations=600000, max_workers=2, max_pending=64, wait_timeout=10.0):
+        self.iterations = iterations
+        self.method = f"pbkdf2:sha256:{iterations}"
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+
+        # Statistics
+        self._hashed = 0
+        self._verified = 0
+        self._rejected = 0
+        self._total_ms = 0.0
+
+    # ---------- public API ----------
+    def hash(self, password):
+        """generate_password_hash with the configured work factor"""
+        return self._run(generate_password_hash, password, method=self.method)
+
+    def verify(self, pwhash, password):
+        """check_password_hash on the hashing pool"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def stats(self):
+        with self._lock:
+            calls = self._hashed + self._verified
+            return {
+                "method": self.method,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "hashed": self._hashed,
+                "verified": self._verified,
+                "rejected": self._rejected,
+                "avg_ms": round(self._total_ms / calls, 2) if calls else 0.0,
+            }
+
+    # ---------- internals ----------
+    def _ensure_executor(self):
+        # Worker threads do not survive fork(), so each process gets its own pool
+        pid = os.getpid()
+        with self._lock:
+            if self._executor_pid != pid:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="password-hash")
+                self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+                self._executor_pid = pid
+            return self._executor, self._slots
+
+    def _run(self, fn, *args, **kwargs):
+        executor, slots = self._ensure_executor()
+        if not slots.acquire(timeout=self.wait_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise TimeoutError("Password hashing is saturated")
+        try:
+            future = executor.submit(self._timed, fn, *args, **kwargs)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future.result()
+
+    def _timed(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            if fn is generate_password_hash:
+                self._hashed += 1
+            else:
+                self._verified += 1
+            self._total_ms += elapsed_ms
+        return result
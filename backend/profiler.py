@@ -0,0 +1,223 @@
+"""
+On-demand request profiler.
+
+An admin enables it at runtime for a sample rate or for the next N matching
+requests. Each profiled request is captured either with cProfile ("cprofile",
+saved as a .prof file readable with pstats/snakeviz) or with a wall-clock stack
+sampler ("sample", saved as folded stacks for flamegraph tools), next to a
+.json file with request metadata.
+
+While disabled the only cost is one shared-flag check per request.
+
+The on/off switch, mode, sample rate and remaining count live in shared
+memory (SharedState) created before the prefork server forks. A POST to
+/admin/profiler in one worker therefore switches every worker, and next_n
+counts requests across all of them. Profile files from every worker land in
+the same directory.
+
+Both modes only see the thread that handles the request. Work handed to other
+threads is missing from the profile:
+- model calls that go through the micro-batchers (ENABLE_MICRO_BATCHING) run
+  on batcher threads, so the request shows them only as waiting on a Future;
+- /predict/batch streams its results after the request hooks have finished,
+  so only the upload parsing is captured.
+Turn micro-batching off while profiling to see model time inline.
+"""
+
+import cProfile
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from shared_state import SharedState
+
+MODES = ("cprofile", "sample")
+_NAME_RE = re.compile(r"^[\w.-]+$")
+
+
+class _StackSampler:
+    """Samples one thread's Python stack every `interval` seconds until stopped"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = [f"{fs.name} ({os.path.basename(fs.filename)}:{fs.lineno})"
+                     for fs in traceback.extract_stack(frame)]
+            self.stacks[";".join(stack)] += 1
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    def __init__(self, directory, max_profiles=200, sample_interval=0.005):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.sample_interval = sample_interval
+
+        # Shared by all prefork workers; remaining = -1 means no request limit
+        self._state = SharedState(enabled=False, mode="cprofile", sample_rate=0.0, remaining=-1,
+                                  route_prefix="/predict", captured=0)
+        # Guards the read-modify-write of the shared settings across processes
+        self._lock = multiprocessing.Lock()
+        # Only one cProfile profiler can be active at a time (per process)
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Hot-path flag: checked on every request"""
+        return self._state["enabled"]
+
+    # ---------- control ----------
+    def enable(self, sample_rate=None, next_n=None, mode="cprofile", route_prefix="/predict"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+        if sample_rate is None and next_n is None:
+            raise ValueError("Provide sample_rate or next_n")
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        if next_n is not None and next_n < 1:
+            raise ValueError("next_n must be at least 1")
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            # First, since it is the one setting that can still be rejected (too long)
+            self._state["route_prefix"] = route_prefix or "/"
+            self._state["mode"] = mode
+            self._state["sample_rate"] = sample_rate if sample_rate is not None else 1.0
+            self._state["remaining"] = next_n if next_n is not None else -1
+            self._state["enabled"] = True
+
+    def disable(self):
+        with self._lock:
+            self._state["enabled"] = False
+            self._state["remaining"] = -1
+
+    def status(self):
+        with self._lock:
+            state = self._state.to_dict()
+        return {
+            "enabled": state["enabled"],
+            "mode": state["mode"],
+            "sample_rate": state["sample_rate"],
+            "remaining": state["remaining"] if state["remaining"] >= 0 else None,
+            "route_prefix": state["route_prefix"],
+            "captured": state["captured"],
+            "directory": self.directory,
+        }
+
+    # ---------- request hooks ----------
+    def start(self, path):
+        """Begin profiling this request if it is selected. Returns a session or None."""
+        with self._lock:
+            if not self._state["enabled"] or not path.startswith(self._state["route_prefix"]):
+                return None
+            if random.random() >= self._state["sample_rate"]:
+                return None
+            if not self._busy.acquire(blocking=False):
+                return None
+            remaining = self._state["remaining"]
+            if remaining >= 0:
+                self._state["remaining"] = remaining - 1
+                if remaining - 1 <= 0:
+                    self._state["enabled"] = False
+            mode = self._state["mode"]
+
+        session = {"mode": mode, "start": time.perf_counter(), "started_at": datetime.now().isoformat()}
+        if mode == "cprofile":
+            session["profile"] = cProfile.Profile()
+            session["profile"].enable()
+        else:
+            session["sampler"] = _StackSampler(threading.get_ident(), self.sample_interval)
+            session["sampler"].start()
+        return session
+
+    def finish(self, session, metadata):
+        """Stop profiling and write the profile plus its metadata"""
+        try:
+            if session["mode"] == "cprofile":
+                session["profile"].disable()
+            else:
+                session["sampler"].stop()
+            duration = time.perf_counter() - session["start"]
+
+            name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+            ext = ".prof" if session["mode"] == "cprofile" else ".folded"
+            path = os.path.join(self.directory, name + ext)
+            if session["mode"] == "cprofile":
+                session["profile"].dump_stats(path)
+            else:
+                session["sampler"].dump(path)
+
+            meta = dict(metadata)
+            meta.update({
+                "name": name,
+                "file": name + ext,
+                "mode": session["mode"],
+                "started_at": session["started_at"],
+                "duration_ms": round(duration * 1000.0, 2),
+            })
+            with open(os.path.join(self.directory, name + ".json"), "w") as f:
+                json.dump(meta, f, indent=2)
+
+            self._state.increment("captured")
+            self._prune()
+        finally:
+            self._busy.release()
+
+    # ---------- storage ----------
+    def list_profiles(self):
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for filename in sorted(os.listdir(self.directory), reverse=True):
+            if filename.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, filename)) as f:
+                        profiles.append(json.load(f))
+                except FileNotFoundError:
+                    pass  # Pruned by another worker meanwhile
+        return profiles
+
+    def profile_path(self, filename):
+        """Absolute path of a stored profile file, or None if the name is invalid/missing"""
+        if not _NAME_RE.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.isfile(path) else None
+
+    def _prune(self):
+        metas = sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+        for meta in metas[:max(0, len(metas) - self.max_profiles)]:
+            stem = meta[:-len(".json")]
+            for ext in (".json", ".prof", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, stem + ext))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Build float16 and int8 TFLite variants of the three models and report how
+they compare with the float32 Keras models.
+
+int8 uses post-training full-integer quantization calibrated on a folder of
+face crops (the same preprocessing app.py applies). The crops are split at
+random (fixed seed): `--eval-fraction` of them are held out and only those are
+used to compare the variants, so int8 is never scored on the crops it was
+calibrated on. The report lists, per model and variant: mask decision flips /
+emotion label flips and confidence deltas on the held-out crops, median
+single-sample latency, file size and resident memory growth.
+Select a variant in the server with MODEL_VARIANT in app.py
+(requires INFERENCE_BACKEND = "tflite").
+
+Usage:
+    python quantize_models.py --calibration-dir face_crops
+    python quantize_models.py --calibration-dir face_crops --variants int8 --report quant_report.json
+    python quantize_models.py --calibration-dir face_crops --samples 400 --eval-fraction 0.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_backends import MODEL_FILES, KerasBackend, TFLiteBackend, load_sample_inputs, model_path
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUANTIZED_VARIANTS = ("float16", "int8")
+SPLIT_SEED = 0
+
+
+def split_samples(inputs, eval_fraction):
+    """Shuffle and split crops into (calibration, evaluation); both keep at least one crop"""
+    if not 0 < eval_fraction < 1:
+        raise ValueError(f"--eval-fraction must be between 0 and 1, got {eval_fraction}")
+    if len(inputs) < 2:
+        raise ValueError(f"Need at least 2 crops to hold some out for evaluation, got {len(inputs)}")
+    order = np.random.default_rng(SPLIT_SEED).permutation(len(inputs))
+    n_eval = min(max(1, round(len(inputs) * eval_fraction)), len(inputs) - 1)
+    return inputs[order[n_eval:]], inputs[order[:n_eval]]
+
+
+def quantize(keras_model, variant, calibration):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variant == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis, ...]]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Keep float32 input/output so the model is a drop-in replacement
+        converter.inference_input_type = tf.float32
+        converter.inference_output_type = tf.float32
+    return converter.convert()
+
+
+def _rss_mb():
+    """Resident set size of this process in MB (Linux), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def _median_latency_ms(backend, sample, runs):
+    backend.predict(sample)  # warmup
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(sample)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return round(float(np.median(timings)), 3)
+
+
+def compare(model_name, reference, outputs):
+    if model_name == "mask":
+        flips = int(np.sum((reference[:, 0] > 0.5) != (outputs[:, 0] > 0.5)))
+        deltas = np.abs(reference[:, 0] - outputs[:, 0])
+        return {"mask_decision_flips": flips,
+                "mean_score_delta": round(float(deltas.mean()), 5),
+                "max_score_delta": round(float(deltas.max()), 5)}
+
+    ref_labels = np.argmax(reference, axis=1)
+    flips = int(np.sum(ref_labels != np.argmax(outputs, axis=1)))
+    # Change in the confidence of the label the float32 model picked
+    rows = np.arange(len(ref_labels))
+    deltas = np.abs(reference[rows, ref_labels] - outputs[rows, ref_labels])
+    return {"emotion_label_flips": flips,
+            "mean_confidence_delta": round(float(deltas.mean()), 5),
+            "max_confidence_delta": round(float(deltas.max()), 5)}
+
+
+def run(calibration_dir, variants, samples, runs, model_dir, eval_fraction):
+    report = {"calibration_dir": calibration_dir, "eval_fraction": eval_fraction, "models": {}}
+
+    for model_name in MODEL_FILES:
+        print(f"\n📦 {model_name}")
+        calibration, held_out = split_samples(load_sample_inputs(model_name, calibration_dir, samples),
+                                              eval_fraction)
+        single = held_out[:1]
+
+        rss_before = _rss_mb()
+        reference_backend = KerasBackend(model_path(model_name, "keras", model_dir))
+        rss_after = _rss_mb()
+        reference = reference_backend.predict(held_out)
+
+        entry = {
+            "calibration_samples": len(calibration),
+            "eval_samples": len(held_out),
+            "float32": {
+                "latency_ms": _median_latency_ms(reference_backend, single, runs),
+                "file_kb": round(os.path.getsize(reference_backend.path) / 1024, 1),
+                "rss_growth_mb": round(rss_after - rss_before, 1) if rss_before else None,
+            },
+        }
+        print(f"   float32: {entry['float32']['latency_ms']} ms")
+
+        for variant in variants:
+            target = model_path(model_name, "tflite", model_dir, variant)
+            with open(target, "wb") as f:
+                f.write(quantize(reference_backend.model, variant, calibration))
+
+            rss_before = _rss_mb()
+            backend = TFLiteBackend(target)
+            rss_after = _rss_mb()
+
+            stats = compare(model_name, reference, backend.predict(held_out))
+            stats["latency_ms"] = _median_latency_ms(backend, single, runs)
+            stats["speedup"] = round(entry["float32"]["latency_ms"] / stats["latency_ms"], 2)
+            stats["file_kb"] = round(os.path.getsize(target) / 1024, 1)
+            stats["rss_growth_mb"] = round(rss_after - rss_before, 1) if rss_before else None
+            entry[variant] = stats
+            print(f"   {variant}: {stats}")
+
+        report["models"][model_name] = entry
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize MaskLens models and report accuracy vs latency")
+    parser.add_argument("--calibration-dir", required=True, help="Folder of sample face crops")
+    parser.add_argument("--variants", nargs="+", choices=QUANTIZED_VARIANTS, default=list(QUANTIZED_VARIANTS))
+    parser.add_argument("--samples", type=int, default=200, help="Maximum crops used for calibration/evaluation")
+    parser.add_argument("--eval-fraction", type=float, default=0.25,
+                        help="Share of the crops held out of calibration and used to count flips")
+    parser.add_argument("--runs", type=int, default=50, help="Timed single-sample runs per model")
+    parser.add_argument("--model-dir", default=BASE_DIR)
+    parser.add_argument("--report", default="quantization_report.json")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MASKLENS MODEL QUANTIZATION")
+    print("=" * 60)
+    try:
+        report = run(args.calibration_dir, args.variants, args.samples, args.runs, args.model_dir,
+                     args.eval_fraction)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report written to {args.report}")
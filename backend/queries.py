@@ -0,0 +1,158 @@
+"""
+SQL for the read queries on the request hot path.
+
+The routes in app.py execute these strings, and check_query_plans.py runs
+EXPLAIN QUERY PLAN on the same strings, so an index that stops being used is
+caught before it reaches production.
+
+Time filters and ordering use the integer epoch columns (emotions.ts,
+users.created_ts); the ISO strings are only selected for display. Per-day and
+total counts come from the rollup tables (see rollups.py) instead of raw
+rows. Window starts are passed in as parameters (see app.since_day() and
+app.since_month_start()).
+"""
+
+FIND_USER_BY_EMAIL = "SELECT id, password_hash, role, fullname FROM users WHERE email = ?"
+
+USER_ROLE = "SELECT role FROM users WHERE id = ?"
+
+DATA_VERSION = "SELECT version, updated_at FROM data_version WHERE id = 1"
+
+USER_EMOTION_TOTALS = """
+    SELECT emotion, SUM(count) as count
+    FROM emotion_daily_user
+    WHERE user_id = ?
+    GROUP BY emotion
+"""
+
+WEEKLY_SUMMARY = """
+    SELECT day, emotion, count
+    FROM emotion_daily_user
+    WHERE user_id = ?
+      AND day >= ?
+    ORDER BY day ASC
+"""
+
+COUNT_USERS = "SELECT COUNT(*) as total FROM users WHERE role = 'user'"
+
+COUNT_EMOTIONS = "SELECT COALESCE(SUM(count), 0) as total FROM emotion_totals"
+
+EMOTION_TOTALS = "SELECT emotion, count FROM emotion_totals"
+
+RECENT_USERS = """
+    SELECT id, fullname, email, created_at
+    FROM users
+    WHERE role = 'user'
+    ORDER BY created_ts DESC
+    LIMIT 10
+"""
+
+DAILY_EMOTIONS_30D = """
+    SELECT day as date, emotion, count
+    FROM emotion_daily
+    WHERE day >= ?
+    ORDER BY day DESC
+"""
+
+ALL_USERS = "SELECT id, fullname, email, role, created_at FROM users ORDER BY created_ts DESC"
+
+
+def emotions_page(limit, cursor=None, newer=False, user_id=None, emotion=None,
+                  start_ts=None, end_ts=None, with_user=False):
+    """
+    Keyset page of emotions rows on (ts, id). Returns (sql, params).
+
+    cursor is the (ts, id) of the row the client stopped at. Pages walk
+    towards older rows (newest first) unless `newer`, in which case rows come
+    back oldest first and the caller reverses them. Every variant is an index
+    range read of `limit` rows however deep the cursor is.
+    """
+    columns = "e.id, e.filename, e.emotion, e.timestamp, e.ts"
+    source = "emotions e"
+    if with_user:
+        columns += ", u.fullname, u.email"
+        source += " JOIN users u ON e.user_id = u.id"
+
+    where, params = [], []
+    if user_id is not None:
+        where.append("e.user_id = ?")
+        params.append(user_id)
+    if emotion is not None:
+        where.append("e.emotion = ?")
+        params.append(emotion)
+    if start_ts is not None:
+        where.append("e.ts >= ?")
+        params.append(start_ts)
+    if end_ts is not None:
+        where.append("e.ts < ?")
+        params.append(end_ts)
+    if cursor is not None:
+        where.append("(e.ts, e.id) > (?, ?)" if newer else "(e.ts, e.id) < (?, ?)")
+        params.extend(cursor)
+
+    order = "ASC" if newer else "DESC"
+    sql = f"SELECT {columns} FROM {source}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY e.ts {order}, e.id {order} LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+
+MONTHLY_USERS = """
+    SELECT strftime('%Y-%m', created_at) as month, COUNT(*) as count
+    FROM users
+    WHERE role = 'user'
+      AND created_ts >= ?
+    GROUP BY strftime('%Y-%m', created_at)
+    ORDER BY month DESC
+    LIMIT 12
+"""
+
+DAILY_ACTIVITY_30D = """
+    SELECT day as date, SUM(count) as count
+    FROM emotion_daily
+    WHERE day >= ?
+    GROUP BY day
+    ORDER BY day DESC
+"""
+
+TOP_USERS = """
+    SELECT u.fullname, u.email, COALESCE(SUM(r.count), 0) as emotion_count
+    FROM users u
+    LEFT JOIN emotion_daily_user r ON u.id = r.user_id
+    WHERE u.role = 'user'
+    GROUP BY u.id
+    ORDER BY emotion_count DESC
+    LIMIT 10
+"""
+
+# Checked by check_query_plans.py
+HOT_QUERIES = {
+    "find_user_by_email": FIND_USER_BY_EMAIL,
+    "user_role": USER_ROLE,
+    "data_version": DATA_VERSION,
+    "user_emotion_totals": USER_EMOTION_TOTALS,
+    "weekly_summary": WEEKLY_SUMMARY,
+    "count_users": COUNT_USERS,
+    "count_emotions": COUNT_EMOTIONS,
+    "emotion_totals": EMOTION_TOTALS,
+    "recent_users": RECENT_USERS,
+    "daily_emotions_30d": DAILY_EMOTIONS_30D,
+    "monthly_users": MONTHLY_USERS,
+    "daily_activity_30d": DAILY_ACTIVITY_30D,
+    "top_users": TOP_USERS,
+}
+
+# Keyset pages: checked like HOT_QUERIES, and must also never sort in a temp b-tree
+PAGE_QUERIES = {
+    "my_emotions_first_page": emotions_page(50, user_id=0)[0],
+    "my_emotions_page": emotions_page(50, cursor=(0, 0), user_id=0)[0],
+    "my_emotions_newer_page": emotions_page(50, cursor=(0, 0), newer=True, user_id=0)[0],
+    "admin_emotions_first_page": emotions_page(100, with_user=True)[0],
+    "admin_emotions_page": emotions_page(100, cursor=(0, 0), with_user=True)[0],
+    "admin_emotions_by_emotion": emotions_page(100, cursor=(0, 0), emotion="", with_user=True)[0],
+    "admin_emotions_by_date": emotions_page(100, cursor=(0, 0), start_ts=0, end_ts=0, with_user=True)[0],
+    "admin_emotions_by_emotion_and_date": emotions_page(
+        100, cursor=(0, 0), emotion="", start_ts=0, end_ts=0, with_user=True)[0],
+}
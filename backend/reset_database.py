@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Database Reset Script for MaskLens
-This script will delete the existing database and recreate it with proper schema.
+This script will delete the existing database and recreate it with the schema
+from migrations.py.
 """
 
 import os
@@ -9,6 +10,8 @@ import sqlite3
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
+from migrations import LATEST_VERSION, migrate
+
 DB_PATH = "database.db"
 
 def reset_database():
@@ -18,42 +21,22 @@ def reset_database():
     if os.path.exists(DB_PATH):
         os.remove(DB_PATH)
         print(f"✅ Deleted existing database: {DB_PATH}")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
     
-    # Create new database
+    # Create new database at the latest schema version
     conn = sqlite3.connect(DB_PATH)
+    migrate(conn)
     cur = conn.cursor()
-    
-    # Create users table with role column
-    cur.execute("""
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fullname TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            role TEXT DEFAULT 'user',
-            created_at TEXT
-        )
-    """)
-    print("✅ Created users table with role column")
-    
-    # Create emotions table
-    cur.execute("""
-        CREATE TABLE emotions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            filename TEXT,
-            emotion TEXT,
-            timestamp TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
-    print("✅ Created emotions table")
+    print(f"✅ Created schema (version {LATEST_VERSION})")
     
     # Create default admin user
     admin_pass = generate_password_hash("admin123")
+    now = datetime.now()
     cur.execute(
-        "INSERT INTO users (fullname, email, password_hash, role, created_at) VALUES (?, ?, ?, ?, ?)",
-        ("Admin", "admin@gmail.com", admin_pass, "admin", datetime.now().isoformat())
+        "INSERT INTO users (fullname, email, password_hash, role, created_at, created_ts) VALUES (?, ?, ?, ?, ?, ?)",
+        ("Admin", "admin@gmail.com", admin_pass, "admin", now.isoformat(), int(now.timestamp()))
     )
     print("✅ Created default admin user")
     print("   📧 Email: admin@gmail.com")
@@ -0,0 +1,154 @@
+"""
+Content-addressed cache for prediction results.
+
+Results are keyed by a hash of the decoded image pixels plus everything else
+that changes the answer (mask inversion state, multi-face mode, model version).
+The memory tier is an LRU bounded by approximate size in bytes with a TTL;
+an optional SQLite file adds a second tier that survives restarts.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(img_bgr, *parts):
+    """Hash the decoded image (shape + pixels) together with any extra key parts"""
+    h = hashlib.sha256()
+    h.update(repr(img_bgr.shape).encode())
+    h.update(img_bgr.tobytes())
+    for part in parts:
+        h.update(b"|")
+        h.update(str(part).encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl_seconds=600, disk_path=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.disk_path = disk_path
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_pid = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- public API ----------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, value, now)
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        self._memory_put(key, value, now)
+        self._disk_put(key, value, now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            if self.disk_path:
+                self._disk_conn().execute("DELETE FROM results")
+                self._disk_conn().commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "disk_tier": self.disk_path,
+            }
+
+    # ---------- memory tier ----------
+    def _memory_put(self, key, value, now):
+        size = len(json.dumps(value)) + len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, size, value)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    # ---------- disk tier ----------
+    def _disk_conn(self):
+        # One connection per process; callers hold self._lock
+        if self._disk is None or self._disk_pid != os.getpid():
+            self._disk = sqlite3.connect(self.disk_path, check_same_thread=False)
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute("CREATE INDEX IF NOT EXISTS idx_results_expires ON results(expires_at)")
+            self._disk_pid = os.getpid()
+        return self._disk
+
+    def _disk_get(self, key, now):
+        if not self.disk_path:
+            return None
+        with self._lock:
+            row = self._disk_conn().execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return json.loads(row[0])
+
+    def _disk_put(self, key, value, now):
+        if not self.disk_path:
+            return
+        with self._lock:
+            conn = self._disk_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl)
+            )
+            conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            conn.commit()
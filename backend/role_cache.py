@@ -0,0 +1,71 @@
+"""
+Short-lived cache of user roles for authorization checks.
+
+Access tokens carry the user's role as a claim (set at /login), so admin
+routes do not have to read the users table to know who is calling. The claim
+alone would stay valid until the token expires, though, so the role is also
+confirmed against this cache: an entry is loaded from the database at most
+once per `ttl_seconds` per user and process, and dropped immediately in the
+process that deletes the user or changes their role. Other worker processes
+pick the change up when their entry expires, so `ttl_seconds` bounds how long
+a revoked admin token keeps working.
+"""
+
+import threading
+import time
+
+
+class RoleCache:
+    def __init__(self, loader, ttl_seconds=60, max_entries=10000):
+        # loader(user_id) -> role, or None for a user that no longer exists
+        self.loader = loader
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}  # user_id -> (role, expires_at)
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """Role of `user_id`, from the cache while fresh, else from the loader"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        role = self.loader(user_id)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[user_id] = (role, now + self.ttl)
+        return role
+
+    def invalidate(self, user_id):
+        """Forget `user_id` after their role changed or they were deleted"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
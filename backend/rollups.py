@@ -0,0 +1,136 @@
+"""
+Daily emotion counts maintained next to the emotions table.
+
+    emotion_daily_user (user_id, day, emotion) -> count    /weekly_summary, top users
+    emotion_daily      (day, emotion)          -> count    admin daily charts
+    emotion_totals     (emotion)               -> count    admin totals
+
+`day` is the local calendar date, i.e. the 'YYYY-MM-DD' prefix of
+emotions.timestamp (what DATE(timestamp) returned). Code that inserts or
+deletes emotions rows calls record() / unrecord_emotion() / unrecord_user()
+with the cursor of the same transaction, so the counts commit or roll back
+together with the rows. Reads then cost one row per (day, emotion) no matter
+how many predictions were stored.
+
+If the counts ever drift (rows edited by hand, old backups restored), rebuild
+them from the emotions table:
+
+    python rollups.py --db database.db
+"""
+
+import argparse
+import sqlite3
+import time
+from collections import Counter
+
+_UPSERT_USER = """
+    INSERT INTO emotion_daily_user (user_id, day, emotion, count) VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, day, emotion) DO UPDATE SET count = count + excluded.count
+"""
+_UPSERT_DAY = """
+    INSERT INTO emotion_daily (day, emotion, count) VALUES (?, ?, ?)
+    ON CONFLICT(day, emotion) DO UPDATE SET count = count + excluded.count
+"""
+_UPSERT_TOTAL = """
+    INSERT INTO emotion_totals (emotion, count) VALUES (?, ?)
+    ON CONFLICT(emotion) DO UPDATE SET count = count + excluded.count
+"""
+
+
+def day_of(timestamp):
+    """Rollup day for an emotions.timestamp ISO string"""
+    return timestamp[:10]
+
+
+def _apply(cur, deltas):
+    """Add {(user_id, day, emotion): delta} to all three rollup tables"""
+    deltas = {key: n for key, n in deltas.items() if n}
+    if not deltas:
+        return
+    per_day = Counter()
+    per_emotion = Counter()
+    for (user_id, day, emotion), n in deltas.items():
+        per_day[(day, emotion)] += n
+        per_emotion[emotion] += n
+
+    cur.executemany(_UPSERT_USER, [(u, d, e, n) for (u, d, e), n in deltas.items()])
+    cur.executemany(_UPSERT_DAY, [(d, e, n) for (d, e), n in per_day.items()])
+    cur.executemany(_UPSERT_TOTAL, [(e, n) for e, n in per_emotion.items()])
+
+    if any(n < 0 for n in deltas.values()):
+        cur.executemany(
+            "DELETE FROM emotion_daily_user WHERE user_id = ? AND day = ? AND emotion = ? AND count <= 0",
+            list(deltas)
+        )
+        cur.executemany("DELETE FROM emotion_daily WHERE day = ? AND emotion = ? AND count <= 0", list(per_day))
+        cur.executemany("DELETE FROM emotion_totals WHERE emotion = ? AND count <= 0", [(e,) for e in per_emotion])
+
+
+def record(cur, rows):
+    """Count newly inserted emotions rows, given as (user_id, timestamp, emotion)"""
+    _apply(cur, Counter(
+        (user_id, day_of(timestamp), emotion)
+        for user_id, timestamp, emotion in rows
+        if user_id is not None and timestamp and emotion
+    ))
+
+
+def unrecord_emotion(cur, emotion_id):
+    """Uncount one emotions row; call before deleting it"""
+    row = cur.execute("SELECT user_id, timestamp, emotion FROM emotions WHERE id = ?", (emotion_id,)).fetchone()
+    if row is not None and row[0] is not None and row[1] and row[2]:
+        _apply(cur, {(row[0], day_of(row[1]), row[2]): -1})
+
+
+def unrecord_user(cur, user_id):
+    """Uncount every emotions row of a user; call before deleting them"""
+    rows = cur.execute(
+        "SELECT day, emotion, count FROM emotion_daily_user WHERE user_id = ?", (user_id,)
+    ).fetchall()
+    _apply(cur, {(user_id, day, emotion): -count for day, emotion, count in rows})
+
+
+def rebuild(conn):
+    """Recompute all rollups from the emotions table in one transaction"""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("DELETE FROM emotion_daily_user")
+        cur.execute("DELETE FROM emotion_daily")
+        cur.execute("DELETE FROM emotion_totals")
+        cur.execute("""
+            INSERT INTO emotion_daily_user (user_id, day, emotion, count)
+            SELECT user_id, substr(timestamp, 1, 10), emotion, COUNT(*)
+            FROM emotions
+            WHERE user_id IS NOT NULL AND timestamp IS NOT NULL AND emotion IS NOT NULL
+            GROUP BY user_id, substr(timestamp, 1, 10), emotion
+        """)
+        cur.execute("""
+            INSERT INTO emotion_daily (day, emotion, count)
+            SELECT day, emotion, SUM(count) FROM emotion_daily_user GROUP BY day, emotion
+        """)
+        cur.execute("""
+            INSERT INTO emotion_totals (emotion, count)
+            SELECT emotion, SUM(count) FROM emotion_daily GROUP BY emotion
+        """)
+        # Counts may have changed: invalidate cached admin snapshots
+        cur.execute("UPDATE data_version SET version = version + 1, updated_at = ? WHERE id = 1", (time.time(),))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COALESCE(SUM(count), 0) FROM emotion_totals").fetchone()[0]
+
+
+if __name__ == "__main__":
+    from migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily emotion rollup tables")
+    parser.add_argument("--db", default="database.db", help="SQLite database file")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    total = rebuild(conn)
+    conn.close()
+    print(f"✅ Rebuilt rollups for {total} emotion records")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Production prefork server for MaskLens.
+
+The parent imports app.py once, then forks N workers that share the listening
+socket. A worker exits after --max-requests requests (plus jitter so
+they do not all restart together) and the parent forks a replacement.
+Settings that must reach every worker (mask_inversion_state) live in shared
+memory, see shared_state.py.
+
+Where the models are loaded depends on INFERENCE_BACKEND:
+- "tflite" / "onnx": loaded once in the parent and shared with the workers
+  copy-on-write; each worker only runs the warmup after fork.
+- "keras" / "tf_function": TensorFlow starts runtime threads as soon as a
+  model is loaded, and a forked child can deadlock on them. The parent
+  therefore never imports TensorFlow, and every worker loads its own copy of
+  the models after fork. That costs one copy of the weights per worker and
+  a slower start, so prefer tflite or onnx with this server.
+
+Usage:
+    python serve.py --workers 4 --port 5000
+"""
+
+import argparse
+import gc
+import os
+import random
+import signal
+import sys
+import threading
+
+from werkzeug.serving import make_server
+
+from model_backends import FORK_SAFE_BACKENDS
+
+
+class RecyclingMiddleware:
+    """Counts requests and shuts the worker's server down after `max_requests`"""
+
+    def __init__(self, wsgi_app, server_ref, max_requests):
+        self.wsgi_app = wsgi_app
+        self.server_ref = server_ref
+        self.max_requests = max_requests
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            with self._lock:
+                self.count += 1
+                recycle = self.max_requests and self.count == self.max_requests
+            if recycle:
+                print(f"Worker {os.getpid()} served {self.count} requests, recycling")
+                # shutdown() waits for serve_forever to return, so it cannot run on a request thread
+                threading.Thread(target=self.server_ref[0].shutdown, daemon=True).start()
+
+
+def run_worker(server, max_requests, prepare, on_exit):
+    # Reset signal handlers inherited from the parent; SIGTERM stops the server
+    # gracefully so on_exit still runs (os._exit below skips atexit handlers)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown, daemon=True).start())
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    prepare()
+
+    server.app = RecyclingMiddleware(server.app, [server], max_requests)
+    # Track request threads so in-flight responses finish before the worker exits
+    server.daemon_threads = False
+    server.block_on_close = True
+
+    print(f"Worker {os.getpid()} started")
+    server.serve_forever()
+    server.server_close()
+    on_exit()
+    os._exit(0)
+
+
+def serve(host, port, workers, max_requests, jitter):
+    # Models are loaded below (or in each worker); warmup runs in each worker after fork
+    os.environ["MASKLENS_WARMUP"] = "0"
+    os.environ["MASKLENS_LOAD_MODELS"] = "0"
+    import app
+
+    if app.INFERENCE_BACKEND in FORK_SAFE_BACKENDS:
+        app.start_model_loading(background=False, warmup=False)
+        if not app.wait_for_models():
+            print(f"❌ Models failed to load: {app.model_status['error']}")
+            sys.exit(1)
+        prepare = app.warmup_models
+    else:
+        print(f"⚠️ {app.INFERENCE_BACKEND} backend is not fork-safe: every worker loads its own models")
+
+        def prepare():
+            app.start_model_loading(background=False, warmup=True)
+            if not app.model_status["ready"]:
+                print(f"❌ Worker {os.getpid()} could not load models: {app.model_status['error']}")
+
+    server = make_server(host, port, app.app, threaded=True)
+    # SQLite handles must not cross fork(); workers open their own pools
+    app.db.close_all()
+    app.job_queue.db.close_all()
+    # Move everything allocated so far out of the GC's reach so collections in
+    # the workers do not touch (and copy) the shared pages
+    gc.freeze()
+
+    def spawn():
+        limit = max_requests + (random.randint(0, jitter) if max_requests and jitter else 0)
+        pid = os.fork()
+        if pid == 0:
+            run_worker(server, limit, prepare, app.flush_pending_writes)
+        return pid
+
+    children = {spawn() for _ in range(workers)}
+    print(f"MaskLens serving on http://{host}:{port} with {workers} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited (status {status}), starting a replacement")
+            children.add(spawn())
+
+    server.server_close()
+    print("MaskLens server stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run MaskLens with a prefork worker pool")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-requests", type=int, default=1000,
+                        help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=100)
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("❌ Prefork serving needs os.fork (Linux/macOS)")
+        sys.exit(1)
+
+    serve(args.host, args.port, args.workers, args.max_requests, args.max_requests_jitter)
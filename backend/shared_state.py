@@ -0,0 +1,61 @@
+"""
+Process-shared settings.
+
+SharedState looks like a small dict but keeps every value in a
+multiprocessing.Value (shared memory), or a fixed-size char array for
+strings. Created in the parent before the prefork server forks, it lets an
+admin toggle in one worker reach all of them.
+"""
+
+import multiprocessing
+
+_TYPECODES = {bool: "b", int: "q", float: "d"}
+STR_MAX_BYTES = 256  # Capacity of a str value (UTF-8); longer strings are rejected
+
+
+class SharedState:
+    def __init__(self, **initial):
+        self._types = {}
+        self._values = {}
+        for key, value in initial.items():
+            self._types[key] = type(value)
+            if isinstance(value, str):
+                self._values[key] = multiprocessing.Array("c", STR_MAX_BYTES)
+                self._values[key].value = self._encode(value)
+            else:
+                self._values[key] = multiprocessing.Value(_TYPECODES[type(value)], value)
+
+    def __getitem__(self, key):
+        if self._types[key] is str:
+            return self._values[key].value.decode("utf-8")
+        return self._types[key](self._values[key].value)
+
+    def __setitem__(self, key, value):
+        shared = self._values[key]
+        if self._types[key] is str:
+            value = self._encode(value)
+        with shared.get_lock():
+            shared.value = value
+
+    @staticmethod
+    def _encode(value):
+        data = str(value).encode("utf-8")
+        if len(data) >= STR_MAX_BYTES:
+            raise ValueError(f"Shared string values are limited to {STR_MAX_BYTES - 1} bytes")
+        return data
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, default=None):
+        return self[key] if key in self._values else default
+
+    def increment(self, key, amount=1):
+        """Atomic add for counters; returns the new value"""
+        shared = self._values[key]
+        with shared.get_lock():
+            shared.value += amount
+            return shared.value
+
+    def to_dict(self):
+        return {key: self[key] for key in self._values}
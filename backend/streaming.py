@@ -0,0 +1,107 @@
+"""
+Helpers for the live webcam stream (/predict/stream).
+
+FaceTracker follows faces between SSD detections with normalized template
+matching in a small search window, which costs a fraction of a face_net pass.
+The detector is re-run every `detect_every` frames or as soon as any tracked
+face drops below `min_confidence`.
+
+LatestFrame is a single-slot mailbox between the socket reader and the
+inference loop: a new frame replaces one that has not been picked up yet,
+so frames arriving while inference is busy are dropped instead of queued.
+"""
+
+import threading
+
+import cv2
+
+
+class FaceTracker:
+    def __init__(self, detect_every=10, min_confidence=0.6, search_margin=0.5):
+        self.detect_every = detect_every
+        self.min_confidence = min_confidence
+        self.search_margin = search_margin
+
+        self._faces = []        # [{"bbox", "area", "confidence"}]
+        self._templates = []    # grayscale crop for each tracked face
+        self._frames_since_detection = 0
+        self._lost = True
+
+    def needs_detection(self):
+        return (
+            self._lost
+            or not self._faces
+            or self._frames_since_detection >= self.detect_every
+        )
+
+    def reset(self, frame_bgr, faces):
+        """Start tracking the faces returned by the detector on this frame"""
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        self._faces = [dict(face) for face in faces]
+        self._templates = [gray[f["bbox"][1]:f["bbox"][3], f["bbox"][0]:f["bbox"][2]].copy() for f in faces]
+        self._frames_since_detection = 0
+        self._lost = not faces
+
+    def update(self, frame_bgr):
+        """Move every tracked box to its best match in this frame. Returns the tracked faces."""
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+        h_img, w_img = gray.shape[:2]
+        self._frames_since_detection += 1
+
+        for i, face in enumerate(self._faces):
+            template = self._templates[i]
+            x1, y1, x2, y2 = face["bbox"]
+            tw, th = x2 - x1, y2 - y1
+            mx, my = int(tw * self.search_margin), int(th * self.search_margin)
+
+            sx1, sy1 = max(0, x1 - mx), max(0, y1 - my)
+            sx2, sy2 = min(w_img, x2 + mx), min(h_img, y2 + my)
+            window = gray[sy1:sy2, sx1:sx2]
+            if window.shape[0] < th or window.shape[1] < tw:
+                self._lost = True
+                break
+
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (bx, by) = cv2.minMaxLoc(scores)
+            if score < self.min_confidence:
+                self._lost = True
+                break
+
+            nx1, ny1 = sx1 + bx, sy1 + by
+            face["bbox"] = (nx1, ny1, nx1 + tw, ny1 + th)
+            face["confidence"] = float(score)
+            self._templates[i] = gray[ny1:ny1 + th, nx1:nx1 + tw].copy()
+
+        return [] if self._lost else self._faces
+
+
+class LatestFrame:
+    """Single-slot frame mailbox that drops unconsumed frames"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self.received += 1
+            self._cond.notify()
+
+    def get(self):
+        """Wait for the next frame. Returns None once closed."""
+        with self._cond:
+            while self._frame is None and not self._closed:
+                self._cond.wait()
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
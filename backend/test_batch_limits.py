@@ -0,0 +1,110 @@
+"""
+Tests for the /predict/batch limits: an over-limit image is reported as a
+per-item error without cutting the NDJSON stream short, and zips with too
+many images or too many unzipped bytes are refused before inflating.
+
+Needs the backend dependencies (Flask, OpenCV) but not the models: the
+prediction itself is replaced by a stub, and the databases and upload folder
+live in a temporary directory. Run with pytest or directly:
+    python test_batch_limits.py
+"""
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("flask")
+import numpy as np
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture(scope="module")
+def masklens(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("masklens")
+    # The prediction is stubbed, so skip loading the real models; importing app
+    # migrates its databases, so keep them away from the tracked ones
+    os.environ.update({
+        "MASKLENS_LOAD_MODELS": "0",
+        "MASKLENS_DB_PATH": str(tmp / "database.db"),
+        "MASKLENS_JOBS_DB_PATH": str(tmp / "jobs.db"),
+        "MASKLENS_UPLOAD_FOLDER": str(tmp / "uploads"),
+    })
+    import app
+    return app
+
+
+def encode(ext, size):
+    ok, buf = cv2.imencode(ext, np.full((size, size, 3), 128, dtype=np.uint8))
+    assert ok
+    return buf.tobytes()
+
+
+def post_batch(masklens, data):
+    with masklens.app.app_context():
+        token = create_access_token(identity="1", additional_claims={"role": "user"})
+    return masklens.app.test_client().post(
+        "/predict/batch",
+        headers={"Authorization": f"Bearer {token}"},
+        data=data,
+        content_type="multipart/form-data",
+    )
+
+
+def zipped(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def test_zip_over_image_count_is_rejected_before_inflating(masklens, monkeypatch):
+    monkeypatch.setitem(masklens.model_status, "ready", True)
+    monkeypatch.setattr(masklens, "BATCH_ENDPOINT_MAX_IMAGES", 2)
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda *args: pytest.fail("member inflated"))
+
+    archive = zipped([(f"{i}.png", b"\0" * 100) for i in range(3)])
+    response = post_batch(masklens, {"archive": (archive, "faces.zip")})
+    assert response.status_code == 400
+    assert "Too many images" in response.get_json()["error"]
+
+
+def test_zip_over_inflated_size_is_rejected(masklens, monkeypatch):
+    monkeypatch.setitem(masklens.model_status, "ready", True)
+    monkeypatch.setattr(masklens, "BATCH_MAX_INFLATED_BYTES", 1024 * 1024)
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda *args: pytest.fail("member inflated"))
+
+    # Compresses to almost nothing but inflates to 2 MB
+    archive = zipped([(f"{i}.png", b"\0" * (512 * 1024)) for i in range(4)])
+    response = post_batch(masklens, {"archive": (archive, "faces.zip")})
+    assert response.status_code == 413
+
+
+def test_oversized_batch_item_is_reported(masklens, monkeypatch):
+    saved = []
+    fake = {"emotion": "happy", "mask_status": "NO MASK", "confidence": 0.9,
+            "faces_detected": 1, "faces": [{"emotion": "happy"}], "image_scale": 1}
+    monkeypatch.setitem(masklens.model_status, "ready", True)
+    monkeypatch.setattr(masklens, "predict_emotion_cached", lambda img, multi_face=False, image_scale=1: (fake, None, None))
+    monkeypatch.setattr(masklens, "save_emotions", lambda rows: saved.extend(rows))
+    monkeypatch.setattr(masklens, "SAVE_RAW_UPLOADS", False)
+    # BMP headers are not parsed up front, so this one is only rejected once decoded
+    monkeypatch.setattr(masklens, "MAX_IMAGE_PIXELS", 32 * 32)
+
+    response = post_batch(masklens, {"images": [(io.BytesIO(encode(".png", 16)), "small.png"),
+                                      (io.BytesIO(encode(".bmp", 64)), "huge.bmp")]})
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    items = {line["filename"]: line for line in lines if "filename" in line}
+    assert "pixels" in items["huge.bmp"]["error"]
+    assert items["small.png"]["emotion"] == "happy"
+    assert lines[-1] == {"done": True, "images": 2, "failed": 1, "saved": 1}
+    assert len(saved) == 1 and saved[0][0] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,95 @@
+"""
+Tests for the header parsing and limits in image_ingest: PNG IHDR and JPEG
+SOF sizes, the IMREAD_REDUCED factor choice and check_limits. The images are
+built by hand, so neither OpenCV nor NumPy is needed. Run with pytest or directly:
+    python test_image_ingest.py
+"""
+import struct
+
+import pytest
+
+import image_ingest
+
+
+def png(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr + b"\0" * 4
+
+
+def segment(marker, payload):
+    return bytes([0xFF, marker]) + struct.pack(">H", len(payload) + 2) + payload
+
+
+def jpeg(width, height, sof=0xC0):
+    app0 = segment(0xE0, b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0")
+    dqt = segment(0xDB, b"\0" + bytes(64))
+    frame = segment(sof, struct.pack(">BHHB", 8, height, width, 3) + bytes(9))
+    sos = segment(0xDA, b"\x03" + bytes(9))
+    return b"\xff\xd8" + app0 + dqt + frame + sos + b"\0" * 16 + b"\xff\xd9"
+
+
+def test_png_size_from_ihdr():
+    assert image_ingest.image_size(png(4000, 3000)) == (4000, 3000)
+
+
+def test_baseline_jpeg_size_from_sof0():
+    assert image_ingest.image_size(jpeg(4032, 3024)) == (4032, 3024)
+
+
+def test_progressive_jpeg_size_from_sof2():
+    assert image_ingest.image_size(jpeg(640, 480, sof=0xC2)) == (640, 480)
+
+
+def test_jpeg_fill_bytes_before_marker_are_skipped():
+    data = jpeg(800, 600)
+    assert image_ingest.image_size(data[:2] + b"\xff\xff" + data[2:]) == (800, 600)
+
+
+def test_jpeg_without_frame_header_before_scan():
+    data = b"\xff\xd8" + segment(0xDA, b"\x03" + bytes(9)) + segment(0xC0, bytes(15))
+    assert image_ingest.image_size(data) is None
+
+
+@pytest.mark.parametrize("data", [
+    png(100, 100)[:20],          # IHDR cut short
+    jpeg(100, 100)[:30],         # Ends inside the quantization table
+    jpeg(100, 100)[:97],         # Ends inside the frame header
+    b"\xff\xd8",
+    b"",
+    b"BM" + bytes(52),           # BMP: sized only once decoded
+])
+def test_truncated_or_unknown_data_has_no_size(data):
+    assert image_ingest.image_size(data) is None
+
+
+@pytest.mark.parametrize("width, height, factor", [
+    (4032, 3024, 4),     # 3024 / 4 = 756 >= 720
+    (8000, 6000, 8),
+    (1920, 1080, 1),     # 1080 / 2 = 540 < 720
+    (1440, 2000, 2),     # Short side decides, portrait too
+    (720, 720, 1),
+])
+def test_reduced_scale_keeps_min_side(width, height, factor):
+    assert image_ingest.reduced_scale(width, height, 720) == factor
+
+
+def test_check_limits_returns_header_size():
+    assert image_ingest.check_limits(png(64, 48), max_bytes=1024, max_pixels=64 * 48) == (64, 48)
+
+
+def test_check_limits_rejects_too_many_bytes():
+    with pytest.raises(ValueError, match="bytes"):
+        image_ingest.check_limits(png(64, 48), max_bytes=10)
+
+
+def test_check_limits_rejects_too_many_pixels_from_header():
+    with pytest.raises(ValueError, match="pixels"):
+        image_ingest.check_limits(jpeg(10000, 10000), max_pixels=50 * 1000 * 1000)
+
+
+def test_check_limits_passes_unparsed_formats():
+    assert image_ingest.check_limits(b"BM" + bytes(52), max_bytes=1024, max_pixels=1) is None
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,38 @@
+"""
+Test that stale jobs are only reclaimed while attempts remain.
+
+Runs against a scratch SQLite file, no server or models needed:
+    python -m pytest test_job_queue.py
+"""
+import os
+import tempfile
+import time
+
+from job_queue import FAILED, JobQueue
+
+
+def test_stale_job_stops_after_max_attempts():
+    path = os.path.join(tempfile.mkdtemp(prefix="masklens-jobs-"), "jobs.db")
+    jobs = JobQueue(path, max_attempts=3, stale_after=0)
+    job_id = jobs.enqueue(1, "image.png", b"payload")
+
+    # A worker that dies mid-job never calls complete() or fail()
+    claimed = 0
+    for _ in range(10):
+        time.sleep(0.01)
+        job = jobs.claim("worker")
+        if job is None:
+            break
+        claimed += 1
+
+    status = jobs.get(job_id)
+    assert claimed == 3
+    assert status["attempts"] == 3
+    assert status["status"] == FAILED
+    assert status["error"]
+    jobs.db.close_all()
+
+
+if __name__ == "__main__":
+    test_stale_job_stops_after_max_attempts()
+    print("✅ Stale jobs stop after max_attempts")
@@ -0,0 +1,234 @@
+"""
+Content-addressed store for uploaded and annotated images.
+
+Every image is named after the SHA-256 of its bytes plus its extension
+("<sha256>.png") and kept two shard levels deep so no directory grows large:
+
+    uploads/ab/cd/abcd...ef.png             raw upload
+    uploads/ab/cd/abcd...ef_annotated.png   annotated copy
+
+The name is what emotions.filename records. Identical images map to the same
+file, so a repeat upload only refreshes its modification time, and two users
+uploading at once can never overwrite each other: files are written to a
+temporary name in the shard and renamed into place.
+
+A background sweep (started in each process on the first write) removes files
+older than `max_age_seconds` and then the least recently written ones until
+the store is under `max_total_bytes`. Processes sharing the folder take turns
+through a lock file, so one sweep runs per `gc_interval_seconds` in total.
+Files directly inside the root (from before the store existed) are left alone.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ANNOTATED_SUFFIX = "_annotated.png"
+_TMP_PREFIX = ".tmp-"
+_TMP_MAX_AGE_SECONDS = 3600
+_HEX = set("0123456789abcdef")
+
+
+class UploadStore:
+    def __init__(self, root, max_age_seconds=None, max_total_bytes=None, gc_interval_seconds=600,
+                 extensions=(".jpg", ".jpeg", ".png", ".bmp", ".webp")):
+        self.root = root
+        self.max_age = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.gc_interval = gc_interval_seconds
+        self.extensions = extensions
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._gc_thread = None
+        self._gc_pid = None
+
+        # Statistics (this process)
+        self._stored = 0
+        self._deduplicated = 0
+        self._last_sweep = None
+
+    # ---------- public API ----------
+    def key_for(self, data, original_name=None):
+        """Store name of `data`: its SHA-256 plus the upload's extension"""
+        ext = os.path.splitext(original_name or "")[1].lower()
+        if ext not in self.extensions:
+            ext = ".png"
+        return hashlib.sha256(data).hexdigest() + ext
+
+    def path_for(self, key):
+        """Absolute path of a stored name (raw or annotated)"""
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data, original_name=None):
+        """Store raw upload bytes (once per content) and return their key"""
+        key = self.key_for(data, original_name)
+        self._write(key, data)
+        return key
+
+    def put_annotated(self, key, png_bytes):
+        """Store the annotated PNG for the raw image `key`"""
+        self._write(os.path.splitext(key)[0] + ANNOTATED_SUFFIX, png_bytes)
+
+    def sweep(self, force=False):
+        """
+        Apply the retention policy now. Unless `force`, skips when another
+        process swept within gc_interval_seconds. Returns the sweep summary or None.
+        """
+        lock_path = os.path.join(self.root, ".gc.lock")
+        with open(lock_path, "a+") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return None
+            lock_file.seek(0)
+            try:
+                last = float(lock_file.read() or 0)
+            except ValueError:
+                last = 0.0
+            if not force and time.time() - last < self.gc_interval:
+                return None
+
+            summary = self._sweep()
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(time.time()))
+            lock_file.flush()
+        with self._lock:
+            self._last_sweep = summary
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "max_age_seconds": self.max_age,
+                "max_total_bytes": self.max_total_bytes,
+                "gc_interval_seconds": self.gc_interval,
+                "stored": self._stored,
+                "deduplicated": self._deduplicated,
+                "last_sweep": self._last_sweep,
+            }
+
+    # ---------- internals ----------
+    def _write(self, key, data):
+        path = self.path_for(key)
+        self._ensure_gc()
+        if os.path.exists(path):
+            try:
+                # Same content already stored: just mark it as recently used
+                os.utime(path)
+                with self._lock:
+                    self._deduplicated += 1
+                return
+            except FileNotFoundError:
+                pass  # Swept in the meantime; write it again
+
+        shard = os.path.dirname(path)
+        os.makedirs(shard, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=shard)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._stored += 1
+
+    def _ensure_gc(self):
+        # Threads do not survive fork(), so start one lazily in every process
+        if self.gc_interval is None or (self.max_age is None and self.max_total_bytes is None):
+            return
+        pid = os.getpid()
+        if self._gc_pid == pid:
+            return
+        with self._lock:
+            if self._gc_pid == pid:
+                return
+            self._gc_pid = pid
+            self._gc_thread = threading.Thread(target=self._run_gc, name="upload-gc", daemon=True)
+            self._gc_thread.start()
+
+    def _run_gc(self):
+        while True:
+            time.sleep(self.gc_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Upload store sweep failed: {e}")
+
+    def _iter_files(self):
+        for level1 in os.listdir(self.root):
+            if len(level1) != 2 or not set(level1) <= _HEX:
+                continue
+            dir1 = os.path.join(self.root, level1)
+            if not os.path.isdir(dir1):
+                continue
+            for dirpath, _, filenames in os.walk(dir1):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield name, path, st
+
+    def _sweep(self):
+        start = time.perf_counter()
+        now = time.time()
+        files = []
+        removed = 0
+        freed = 0
+
+        def remove(path, size):
+            nonlocal removed, freed
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            removed += 1
+            freed += size
+
+        for name, path, st in self._iter_files():
+            if name.startswith(_TMP_PREFIX):
+                # Left behind by a writer that died mid-upload
+                if now - st.st_mtime > _TMP_MAX_AGE_SECONDS:
+                    remove(path, st.st_size)
+            elif self.max_age is not None and now - st.st_mtime > self.max_age:
+                remove(path, st.st_size)
+            else:
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        kept = len(files)
+        if self.max_total_bytes is not None and total > self.max_total_bytes:
+            # Least recently written (or re-uploaded) first
+            files.sort()
+            for _, size, path in files:
+                if total <= self.max_total_bytes:
+                    break
+                remove(path, size)
+                total -= size
+                kept -= 1
+
+        return {
+            "at": now,
+            "removed": removed,
+            "freed_bytes": freed,
+            "files": kept,
+            "total_bytes": total,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
@@ -0,0 +1,190 @@
+"""
+Write-behind buffer that group-commits rows.
+
+Request threads hand rows to a WriteBehindBuffer instead of committing them
+one by one. A background thread collects rows until `max_rows` are queued or
+`flush_interval_ms` has passed since the first one, then writes the whole
+group with a single `flush_fn(rows)` call (one transaction, one fsync).
+
+The queue is bounded: when the writer falls behind, submit() blocks for up to
+`put_timeout` seconds and then writes the rows itself, so callers slow down
+instead of memory growing without limit. close() (registered with atexit by
+the app) drains whatever is still queued.
+
+Rows that are queued but not yet flushed are lost if the process is killed;
+keep the buffer off where that matters.
+"""
+
+import os
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush_fn, name, max_rows=200, flush_interval_ms=20, max_queue=10000,
+                 put_timeout=1.0, on_flush=None):
+        self.flush_fn = flush_fn
+        self.name = name
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        # on_flush(row_count, seconds), e.g. to feed metrics
+        self.on_flush = on_flush
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+
+        # Statistics
+        self._flushes = 0
+        self._rows = 0
+        self._largest_flush = 0
+        self._last_flush_ms = 0.0
+        self._blocked_writes = 0
+        self._errors = 0
+
+    # ---------- public API ----------
+    def submit(self, rows):
+        """Queue rows for the next group commit; blocks (then writes inline) when the queue is full"""
+        if self._closed:
+            self._write(list(rows))
+            return
+        self._ensure_worker()
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                with self._lock:
+                    self._blocked_writes += 1
+                self._write(list(rows[i:]))
+                return
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        while True:
+            batch = self._drain(self.max_rows)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=10.0):
+        """Stop buffering, let the worker commit what it holds and flush the rest (idempotent)"""
+        if self._closed:
+            return
+        self._closed = True
+        worker = self._worker
+        if worker is not None and self._worker_pid == os.getpid() and worker.is_alive():
+            self._queue.put(_STOP)
+            worker.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            avg = (self._rows / self._flushes) if self._flushes else 0.0
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "max_rows": self.max_rows,
+                "flush_interval_ms": self.flush_interval * 1000.0,
+                "flushes": self._flushes,
+                "rows": self._rows,
+                "avg_flush_size": round(avg, 2),
+                "largest_flush": self._largest_flush,
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "blocked_writes": self._blocked_writes,
+                "errors": self._errors,
+            }
+
+    # ---------- worker ----------
+    def _ensure_worker(self):
+        # Threads do not survive fork(), so start one lazily in every process
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid:
+                return
+            if self._worker_pid != pid:
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._worker_pid = pid
+            self._worker = threading.Thread(
+                target=self._run, name=f"write-buffer-{self.name}", daemon=True
+            )
+            self._worker.start()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                batch.append(row)
+        return batch
+
+    def _collect(self):
+        """
+        Block for the first row, then gather more until the group is full or the
+        interval expires. Returns (rows, stop).
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if row is _STOP:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _write(self, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        # One writer at a time, so a flush from close() cannot interleave with the worker's
+        with self._flush_lock:
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                print(f"Write buffer '{self.name}' failed to write {len(batch)} rows: {e}")
+                raise
+        elapsed = time.perf_counter() - start
+
+        size = len(batch)
+        with self._lock:
+            self._flushes += 1
+            self._rows += size
+            self._largest_flush = max(self._largest_flush, size)
+            self._last_flush_ms = elapsed * 1000.0
+        if self.on_flush is not None:
+            self.on_flush(size, elapsed)
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            try:
+                self._write(batch)
+            except Exception:
+                # Already logged; the rows are dropped rather than retried forever
+                pass
+            if stop:
+                return
@@ -8,6 +8,7 @@ const AdminDashboard = () => {
   const [dashboardData, setDashboardData] = useState(null);
   const [users, setUsers] = useState([]);
   const [emotions, setEmotions] = useState([]);
+  const [emotionsCursor, setEmotionsCursor] = useState(null);
   const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(false);
   const [showAddUserForm, setShowAddUserForm] = useState(false);
@@ -85,11 +86,15 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchEmotions = async () => {
+  // Without a cursor this loads the newest page; with one it appends older records
+  const fetchEmotions = async (cursor = null) => {
     const token = localStorage.getItem("access_token");
+    const url = cursor
+      ? `http://localhost:5000/admin/emotions?cursor=${encodeURIComponent(cursor)}`
+      : "http://localhost:5000/admin/emotions";
     
     try {
-      const response = await fetch("http://localhost:5000/admin/emotions", {
+      const response = await fetch(url, {
         method: "GET",
         headers: {
           "Authorization": `Bearer ${token}`,
@@ -98,7 +103,8 @@ const AdminDashboard = () => {
 
       if (response.ok) {
         const data = await response.json();
-        setEmotions(data.emotions);
+        setEmotions(cursor ? (prev) => [...prev, ...data.emotions] : data.emotions);
+        setEmotionsCursor(data.next_cursor);
       }
     } catch (error) {
       console.error("Error fetching emotions:", error);
@@ -622,7 +628,7 @@ const AdminDashboard = () => {
           <div style={styles.tableContainer}>
             <div style={styles.tableHeader}>
               <h2>Emotion Records</h2>
-              <button style={styles.refreshBtn} onClick={fetchEmotions}>
+              <button style={styles.refreshBtn} onClick={() => fetchEmotions()}>
                 🔄 Refresh
               </button>
             </div>
@@ -662,6 +668,11 @@ const AdminDashboard = () => {
                 </div>
               ))}
             </div>
+            {emotionsCursor && (
+              <button style={styles.refreshBtn} onClick={() => fetchEmotions(emotionsCursor)}>
+                ⬇️ Load older records
+              </button>
+            )}
           </div>
         )}
 
@@ -15,6 +15,7 @@ const Dashboard = () => {
   const [showProfile, setShowProfile] = useState(false);
   const [showWeeklySummary, setShowWeeklySummary] = useState(false);
   const [emotionHistory, setEmotionHistory] = useState([]);
+  const [emotionTotals, setEmotionTotals] = useState({ total: 0, by_emotion: {} });
   const [weeklySummaryData, setWeeklySummaryData] = useState(null);
   const [isAdmin, setIsAdmin] = useState(false);
   const [userFullname, setUserFullname] = useState("");
@@ -74,7 +75,11 @@ const Dashboard = () => {
       const data = await response.json();
       
       if (response.ok) {
+        // First page of the history; totals cover all of it
         setEmotionHistory(data.emotions);
+        if (data.totals) {
+          setEmotionTotals(data.totals);
+        }
       } else {
         console.error("Failed to fetch emotions:", data);
       }
@@ -331,9 +336,9 @@ const Dashboard = () => {
           <div style={styles.infoCard}>
             <h3 style={styles.cardTitle}>User Profile</h3>
             <div style={styles.userInfo}>
-              <p><strong>Total Predictions:</strong> {emotionHistory.length}</p>
-              <p><strong>Happy Emotions:</strong> {emotionHistory.filter(e => e.emotion === "Happy").length}</p>
-              <p><strong>Sad Emotions:</strong> {emotionHistory.filter(e => e.emotion === "Sad").length}</p>
+              <p><strong>Total Predictions:</strong> {emotionTotals.total}</p>
+              <p><strong>Happy Emotions:</strong> {emotionTotals.by_emotion.Happy || 0}</p>
+              <p><strong>Sad Emotions:</strong> {emotionTotals.by_emotion.Sad || 0}</p>
             </div>
             
             <h4 style={{ marginTop: "20px", marginBottom: "10px" }}>Recent History:</h4>